@@ -6,12 +6,30 @@ os.environ["HF_HOME"] = "/tmp/.cache"
 os.environ["HF_HUB_CACHE"] = "/tmp/.cache"
 os.environ["TRANSFORMERS_CACHE"] = "/tmp/.cache"
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException,Query 
-from src.model import predict,training
-import pandas as pd
+from src.model import predict, predict_many
+from src.geo_cache import SEEDED_CITIES
+from typing import List, Optional
+from src import http_client, training_jobs, model_registry
 import asyncio
+import pandas as pd
+
+# the ui and training workers take their shares of the openweather quota, the api keeps the rest
+http_client.set_rate_share(http_client.API_RATE_SHARE)
+
+@asynccontextmanager
+async def lifespan(app):
+    # unpickle every model before the first request and keep swapping in retrained ones
+    await model_registry.preload()
+    watcher = asyncio.create_task(model_registry.watch())
+    yield
+    watcher.cancel()
+    # release the pooled openweather connections and stop a training worker still running
+    await http_client.close_client()
+    training_jobs.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def root():
@@ -29,7 +47,46 @@ async def get_prediction(city_name: str = Query("rawalpindi", description="City
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
 
+@app.get("/predictions")
+async def get_predictions(city_name: Optional[List[str]] = Query(None, description="Cities to forecast, all of them if omitted")):
+    # every requested city's forecast in one round-trip, inputs fetched concurrently
+    try:
+        predictions, origin_point = await predict_many(city_name or list(SEEDED_CITIES))
+        return {
+            city: prediction.to_dict(orient="records") if isinstance(prediction, pd.DataFrame) else {"error": prediction}
+            for city, prediction in predictions.items()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/retrain")
-async def retrain():
-    asyncio.create_task(training())
-    return {"status": "Retraining started in background"}
\ No newline at end of file
+def retrain(force: bool = Query(False, description="Retrain every city, even without new rows")):
+    # training runs in a worker process; while a job is active the same job is returned
+    job, deduplicated = training_jobs.submit(force=force)
+    return {"job_id": job["id"], "status": job["status"], "deduplicated": deduplicated}
+
+
+@app.get("/retrain/{job_id}")
+def retrain_status(job_id: str):
+    job = training_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"no training job {job_id}")
+    return job
+
+
+@app.delete("/retrain/{job_id}")
+def cancel_retrain(job_id: str):
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"no training job {job_id}")
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+@app.get("/models")
+def models():
+    return model_registry.loaded()
+
+
+@app.get("/upstream_stats")
+def upstream_stats():
+    return http_client.stats()
@@ -1,7 +1,12 @@
 import pandas as pd
 import os
+import sys
 import glob
 
+# make the repo's src package importable when run from this folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from src.data_loader import load_history_csv
+
 # Path to the folder with CSVs
 folder_path = ''
 
@@ -9,7 +14,7 @@ folder_path = ''
 csv_files = glob.glob(os.path.join(folder_path, '*.csv'))
 
 # Read and concatenate them into a single DataFrame
-combined_df = pd.concat([pd.read_csv(f) for f in csv_files], ignore_index=True)
+combined_df = pd.concat([load_history_csv(f) for f in csv_files], ignore_index=True)
 
 # Save the result to a new CSV file (optional)
-combined_df.to_csv('historical_air_pollution_2022-01-01_to_2025-3-01_rawalpindi.csv', index=False)
+combined_df.to_csv('historical_air_pollution_2022-01-01_to_2025-3-01_rawalpindi.csv', index=False, date_format='%Y-%m-%d %H:%M:%S')
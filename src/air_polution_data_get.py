@@ -1,45 +1,151 @@
 import pandas as pd
-import requests
+import numpy as np
+import httpx
 import os
 from datetime import datetime, timezone, timedelta, date
 from dotenv import load_dotenv,find_dotenv
 import pytz
-from timezonefinder import TimezoneFinder
-from huggingface_hub import HfApi, upload_file,hf_hub_download
+from huggingface_hub import HfApi, CommitOperationAdd, hf_hub_download
 import asyncio
+import hashlib
+from operator import itemgetter
+from src import http_client, geo_cache, history_store
 
 load_dotenv(find_dotenv())  
 API_key = os.getenv("openweather_API_key")
 hf_token = os.getenv("HF_TOKEN")
 
+# column layout of every history frame / csv, and the openweather component key feeding each pollutant column
+HISTORY_COLUMNS = ["Timestamp", "AQI", "CO", "NO", "NO2", "O3", "SO2", "PM2.5", "PM10", "NH3"]
+COMPONENT_KEYS = {"CO": "co", "NO": "no", "NO2": "no2", "O3": "o3", "SO2": "so2", "PM2.5": "pm2_5", "PM10": "pm10", "NH3": "nh3"}
+
+# history backfill: the full range is fetched as fixed windows, each checkpointed to disk once done
+BACKFILL_START = "2022-01-01T00:00:00"
+BACKFILL_WINDOW_HOURS = 30 * 24
+BACKFILL_MAX_CONCURRENCY = 4
+BACKFILL_CHECKPOINT_DIR = os.path.join("/tmp", "backfill")
+
 
 ############################################# safe upload to hf hub #######################################################
-async def safe_upload(path, repo_id, repo_type, token, delay=3, retries=3):
-    """Retry upload with backoff and spacing to avoid HF 500 errors."""
-    for attempt in range(1, retries + 1):
-        try:
-            upload_file(
-                path_or_fileobj=path,
-                path_in_repo=os.path.basename(path),
-                repo_id=repo_id,
-                repo_type=repo_type,
-                token=token,
-            )
-            print(f"Uploaded {os.path.basename(path)}")
-            await asyncio.sleep(delay)  # give HF some breathing room
-            return
-        except Exception as e:
-            print(f"⚠️ Upload attempt {attempt} failed: {e}")
-            await asyncio.sleep(delay * attempt)
-    print(f"Failed to upload {path} after {retries} retries")
+def _file_hashes(path):
+    """(sha256, git blob sha1) of a local file, matching what the hub reports for lfs / regular files."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        content = f.read()
+    sha256.update(content)
+    git_sha1 = hashlib.sha1(b"blob %d\0" % len(content) + content)
+    return sha256.hexdigest(), git_sha1.hexdigest()
+
+
+def _unchanged_on_hub(api, repo_id, repo_type, files):
+    """Return the repo paths in files ({path_in_repo: local_path}) whose remote content is identical."""
+    try:
+        remote = api.get_paths_info(repo_id, list(files), repo_type=repo_type)
+    except Exception as e:
+        print(f"Error: could not compare with hub copies ({e}), uploading everything")
+        return set()
+    unchanged = set()
+    for info in remote:
+        local_path = files.get(info.path)
+        if local_path is None or not hasattr(info, "blob_id"):
+            continue
+        sha256, git_sha1 = _file_hashes(local_path)
+        if (info.lfs is not None and info.lfs.sha256 == sha256) or (info.lfs is None and info.blob_id == git_sha1):
+            unchanged.add(info.path)
+    return unchanged
+
+
+class UploadBatch:
+    """
+    Collects files headed for the hub and pushes them as one commit per repo.
+    Files whose content already matches the hub copy are skipped, and all hub calls run off the event loop.
+    """
+    def __init__(self):
+        self.files = {}  # (repo_id, repo_type) -> {path_in_repo: local_path}
+
+    def add(self, path, repo_id, repo_type, path_in_repo=None):
+        self.files.setdefault((repo_id, repo_type), {})[path_in_repo or os.path.basename(path)] = path
+
+    async def commit(self, token, message="Update files", delay=3, retries=3):
+        """Upload every collected file, retrying each repo commit with backoff to ride out HF 500 errors."""
+        api = HfApi(token=token)
+        for (repo_id, repo_type), files in self.files.items():
+            unchanged = await asyncio.to_thread(_unchanged_on_hub, api, repo_id, repo_type, files)
+            operations = [
+                CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=path)
+                for path_in_repo, path in sorted(files.items()) if path_in_repo not in unchanged
+            ]
+            if unchanged:
+                print(f"Skipping {len(unchanged)} unchanged files on {repo_id}")
+            if not operations:
+                continue
+            for attempt in range(1, retries + 1):
+                try:
+                    await asyncio.to_thread(
+                        api.create_commit, repo_id, operations, commit_message=message, repo_type=repo_type
+                    )
+                    print(f"Uploaded {len(operations)} files to {repo_id} in one commit")
+                    break
+                except Exception as e:
+                    print(f"⚠️ Upload attempt {attempt} failed: {e}")
+                    await asyncio.sleep(delay * attempt)
+            else:
+                print(f"Failed to upload {len(operations)} files to {repo_id} after {retries} retries")
+        self.files = {}
+
+
+async def safe_upload(path, repo_id, repo_type, token, delay=3, retries=3, path_in_repo=None):
+    """Upload a single file off the event loop, skipping it if the hub copy is identical."""
+    batch = UploadBatch()
+    batch.add(path, repo_id, repo_type, path_in_repo)
+    await batch.commit(token, message=f"Upload {path_in_repo or os.path.basename(path)}", delay=delay, retries=retries)
+
+############################################ parse pollution responses ###################################################
+def parse_pollution_list(entries, timezone_str):
+    """
+    Turn the "list" of an air_pollution(/history) response into a typed DataFrame.
+    Columns are filled straight into numpy arrays and the "dt" epochs are converted
+    to local "%Y-%m-%d %H:%M:%S" strings in one vectorized pass.
+    """
+    n = len(entries)
+    if n == 0:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    epochs = np.fromiter((entry["dt"] for entry in entries), dtype=np.int64, count=n)
+    aqi = np.fromiter((entry["main"]["aqi"] for entry in entries), dtype=np.int64, count=n)
+    get_components = itemgetter(*COMPONENT_KEYS.values())
+    components = np.array([get_components(entry["components"]) for entry in entries], dtype=np.float64)
+
+    local_time = (
+        pd.to_datetime(epochs, unit="s", utc=True)
+        .tz_convert(str(timezone_str))
+        .tz_localize(None)
+        .values.astype("datetime64[s]")
+    )
+    timestamps = np.char.replace(np.datetime_as_string(local_time, unit="s"), "T", " ").astype(object)
+
+    df = pd.DataFrame(components, columns=list(COMPONENT_KEYS))
+    df.insert(0, "AQI", aqi)
+    df.insert(0, "Timestamp", timestamps)
+    return df
+
 
 ################################################### get cordinates #######################################################
 async def get_cordinates(city_name, key = API_key):
     """
     Get the latitude, longitude, and timezone for a city.
+    Known cities are answered from the geo cache without any I/O.
     """
-    url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_name}&appid={key}"
-    response = requests.get(url)
+    cached = geo_cache.lookup(city_name)
+    if cached is not None:
+        latitude, longitude, timezone_str = cached
+        return latitude, longitude, pytz.timezone(timezone_str), "None"
+
+    try:
+        response = await http_client.get("/geo/1.0/direct", params={"q": city_name, "appid": key})
+    except httpx.HTTPError as e:
+        print(f"Error: {e!r}")
+        return None, None, None, f"Error: could not reach geocoding service ({e!r})"
     if response.status_code == 200:
         data = response.json()
         if data and isinstance(data, list) and len(data) > 0:
@@ -47,11 +153,8 @@ async def get_cordinates(city_name, key = API_key):
             longitude = data[0]["lon"]
             
             # Get timezone using latitude and longitude
-            tf = TimezoneFinder()
-            timezone_str = tf.timezone_at(lng=longitude, lat=latitude)
-            
-            if not timezone_str:
-                timezone_str = "UTC"  # Fallback to UTC
+            timezone_str = geo_cache.timezone_at(latitude, longitude)
+            geo_cache.store(city_name, latitude, longitude, timezone_str)
             
             return latitude, longitude, pytz.timezone(timezone_str),"None"
         else:
@@ -73,37 +176,41 @@ async def get_latest_data(city_name, key = API_key):
         return error
     
 
-    url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={latitude}&lon={longitude}&appid={key}"
-    response = requests.get(url)
+    try:
+        response = await http_client.get("/data/2.5/air_pollution", params={"lat": latitude, "lon": longitude, "appid": key})
+    except httpx.HTTPError as e:
+        return f"Error: {e!r}"
     
     if response.status_code == 200:
         data = response.json()
-        pollution_data = data["list"][0]  # Get the first (and usually only) entry
-        components = pollution_data["components"]
-        print(pollution_data["dt"])
-        # Convert UTC timestamp to local timezone
-        utc_time = datetime.fromtimestamp(pollution_data["dt"], timezone.utc)
-        local_time = utc_time.astimezone(timezone_str)
-        readable_time = local_time.strftime('%Y-%m-%d %H:%M:%S')
-    
-        df = pd.DataFrame([{
-            "Timestamp": readable_time,
-            "AQI": pollution_data["main"]["aqi"],
-            "CO": components["co"],
-            "NO": components["no"],
-            "NO2": components["no2"],
-            "O3": components["o3"],
-            "SO2": components["so2"],
-            "PM2.5": components["pm2_5"],
-            "PM10": components["pm10"],
-            "NH3": components["nh3"]
-        }])
+        print(data["list"][0]["dt"])
+        # Only the first (and usually only) entry is the current reading
+        df = parse_pollution_list(data["list"][:1], timezone_str)
         return df
     
     else:
         return f"Error {response.status_code}: {response.text}"
 
 
+############################################ fetch one history range #####################################################
+async def fetch_history_window(latitude, longitude, timezone_str, start_timestamp, end_timestamp, key = API_key):
+    """
+    Fetch the air_pollution/history range [start_timestamp, end_timestamp] (utc epochs) for a location.
+    Returns the parsed DataFrame or an error string.
+    """
+    params = {"lat": latitude, "lon": longitude, "start": start_timestamp, "end": end_timestamp, "appid": key}
+    try:
+        response = await http_client.get("/data/2.5/air_pollution/history", params=params)
+    except httpx.HTTPError as e:
+        return f"Error: {e!r}"
+
+    if response.status_code == 200:
+        data = response.json()
+        return parse_pollution_list(data.get("list", []), timezone_str)
+    else:
+        return f"Error {response.status_code}: {response.text}"
+
+
 #################################################### get history data #######################################################
 async def get_history_data(city_name, start_date, end_date, key = API_key, mode="save"):
     """
@@ -129,158 +236,220 @@ async def get_history_data(city_name, start_date, end_date, key = API_key, mode=
     end_timestamp = int(local_end_dt.astimezone(timezone.utc).timestamp())
 
 
-    url = f"http://api.openweathermap.org/data/2.5/air_pollution/history?lat={latitude}&lon={longitude}&start={start_timestamp}&end={end_timestamp}&appid={key}"
-
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        data = response.json()
-        
-        # Extract relevant data
-        records = []
-        for entry in data.get("list", []):
-            components = entry["components"]
-
-            # Convert UTC timestamp to local timezone
-            utc_time = datetime.fromtimestamp(entry["dt"], timezone.utc)
-            local_time = utc_time.astimezone(timezone_str)
-            readable_time = local_time.strftime('%Y-%m-%d %H:%M:%S')
-
-            records.append({
-                "Timestamp": readable_time,
-                "AQI": entry["main"]["aqi"],
-                "CO": components["co"],
-                "NO": components["no"],
-                "NO2": components["no2"],
-                "O3": components["o3"],
-                "SO2": components["so2"],
-                "PM2.5": components["pm2_5"],
-                "PM10": components["pm10"],
-                "NH3": components["nh3"]
-            })
-    
-
-        df = pd.DataFrame(records)
+    df = await fetch_history_window(latitude, longitude, timezone_str, start_timestamp, end_timestamp, key)
+    if not isinstance(df, pd.DataFrame):
+        return df
 
-        if mode == "save":
-            os.makedirs("tmp/air_quality_historic_data_csv", exist_ok=True)
-            filename = f"tmp/air_quality_historic_data_csv/historical_air_pollution_{start_date}_to_{end_date}_{city_name}.csv"
-            df.to_csv(filename, index=False)
-            return f"Data saved to {filename}"
-        else:
-            return df
+    if mode == "save":
+        os.makedirs("tmp/air_quality_historic_data_csv", exist_ok=True)
+        filename = f"tmp/air_quality_historic_data_csv/historical_air_pollution_{start_date}_to_{end_date}_{city_name}.csv"
+        df.to_csv(filename, index=False)
+        return f"Data saved to {filename}"
     else:
-        return f"Error {response.status_code}: {response.text}"
+        return df
 
 #################################################### get all history data #######################################################
-async def update_history_data(city_name, key = API_key):
+async def update_history_data(city_name, key = API_key, repair=False, uploads=None):
     """
-    Fetch historical air pollution data for a given city and adjust timestamps to the local timezone.
+    Bring the city's partitioned history store up to date and return the full history.
+    Only the month partitions that received new hours are rewritten and uploaded.
+    With repair=True, holes in the stored series are refetched as well (see repair_history).
+    Pass an UploadBatch as uploads to defer the upload to the caller's commit.
     """
-    tmp_path = os.path.join("/tmp", "air_quality_historic_data_csv", f"historical_air_pollution_all_{city_name}.csv")
-
-
     latitude, longitude, timezone_str, error  = await get_cordinates(city_name, key)
     if latitude is None or longitude is None or timezone_str is None:
         print(error)
         return error
-    
+
+    await asyncio.to_thread(history_store.pull, city_name, hf_token)
+    changed = set()
+
+    if not history_store.partitions(city_name):
+        # first run against the partitioned store: seed it from the legacy csv if there is one
+        file_path = await asyncio.to_thread(find_legacy_history_csv, city_name)
+        if file_path is not None:
+            changed.update(history_store.import_csv(city_name, file_path))
+            print(f"history store for {city_name} seeded from {file_path}")
+
+    last_timestamp = history_store.last_timestamp(city_name)
+    if last_timestamp is not None:
+        # resume at the hour after the newest stored one
+        start_date = (datetime.strptime(last_timestamp, "%Y-%m-%d %H:%M:%S") + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        print(f"no history stored for {city_name}, backfilling from {BACKFILL_START}")
+        start_date = BACKFILL_START
+          
+    end_date = datetime.now()
+    end_date = end_date.strftime('%Y-%m-%dT%H:%M:%S')
+
+    start_timestamp = local_to_utc_timestamp(start_date, timezone_str)
+    end_timestamp = local_to_utc_timestamp(end_date, timezone_str)
+
+    if start_timestamp < end_timestamp:
+        if end_timestamp - start_timestamp > BACKFILL_WINDOW_HOURS * 3600:
+            # no history at all, or a store far behind (e.g. seeded from the backup csv): fetch the
+            # range window by window, resumable, instead of in one all-or-nothing request
+            df = await backfill_history(city_name, latitude, longitude, timezone_str, start_timestamp, end_timestamp, key)
+        else:
+            df = await fetch_history_window(latitude, longitude, timezone_str, start_timestamp, end_timestamp, key)
+        if not isinstance(df, pd.DataFrame):
+            return df
+        changed.update(history_store.append_history(city_name, df))
+    else:
+        print(f"history for {city_name} is already up to date")
+
+    if repair:
+        changed.update(await repair_history(city_name, key))
+    if changed:
+        print(f"history for {city_name} updated, partitions changed: {sorted(changed)}")
+
+    batch = uploads if uploads is not None else UploadBatch()
+    for month in sorted(changed):
+        batch.add(
+            history_store.partition_path(city_name, month),
+            repo_id=history_store.DATASET_REPO,
+            repo_type="dataset",
+            path_in_repo=history_store.repo_path(city_name, month),
+            )
+    if uploads is None:
+        await batch.commit(hf_token, message=f"Update {city_name} history")
+    return history_store.read_history(city_name)
+
+
+def find_legacy_history_csv(city_name):
+    """
+    Locate the pre-partitioning historical_air_pollution_all_{city}.csv: hf hub, then /tmp, then backup.
+    """
+    filename = f"historical_air_pollution_all_{city_name}.csv"
     try:
         file_path = hf_hub_download(
-            repo_id="mk12rule/pakistan_air_quality_dataset",
-            filename=f"historical_air_pollution_all_{city_name}.csv",       # update this to match your file name in the repo
+            repo_id=history_store.DATASET_REPO,
+            filename=filename,
             repo_type="dataset",
             cache_dir="/tmp/.cache"
             )
         print(f"data file downloaded from hf hub: {file_path}")
+        return file_path
     except Exception as e:
         print(f"Error: {e}") 
         print("data file could not be downloaded from hf hub")
-        if(os.path.exists(tmp_path)):
-            file_path = tmp_path
-            print(f"using data file found in tmp: {file_path}")
-        else:
-            file_path = f"backup/air_quality_historic_data_csv/historical_air_pollution_all_{city_name}.csv"
-            print(f"using data file found in backup: {file_path}")
+    for file_path in [os.path.join("/tmp", "air_quality_historic_data_csv", filename),
+                      os.path.join("backup", "air_quality_historic_data_csv", filename)]:
+        if os.path.exists(file_path):
+            print(f"using data file found at {file_path}")
+            return file_path
+    return None
 
-    
-    if(os.path.exists(file_path)):
-        df_old = pd.read_csv(file_path)
-        start_date = df_old['Timestamp'].iloc[-1]
-        start_date = start_date.replace(' ', 'T')
-    else:
-        print("data file does not exist starting from 2022-01-01")
-        start_date = "2022-01-01T00:00:00"
-          
-    end_date = datetime.now()
-    end_date = end_date.strftime('%Y-%m-%dT%H:%M:%S')
 
-    
-    if latitude is None or longitude is None:
-        return "Error: Could not retrieve location data."
+def local_to_utc_timestamp(local_date, timezone_str):
+    """Convert a local "%Y-%m-%dT%H:%M:%S" or "%Y-%m-%d %H:%M:%S" string to a utc epoch."""
+    local_dt = timezone_str.localize(datetime.strptime(local_date.replace(' ', 'T'), "%Y-%m-%dT%H:%M:%S"))
+    return int(local_dt.astimezone(timezone.utc).timestamp())
 
-    if (start_date == end_date):
-        print("Error: Start date and end date cannot be the same.")
-        return df_old
-    
-    if "T" in start_date and "T" in end_date:
-        local_start_dt = timezone_str.localize(datetime.strptime(start_date, "%Y-%m-%dT%H:%M:%S"))
-        local_end_dt = timezone_str.localize(datetime.strptime(end_date, "%Y-%m-%dT%H:%M:%S"))
-    else:
-        local_start_dt = timezone_str.localize(datetime.strptime(start_date, "%Y-%m-%d"))
-        local_end_dt = timezone_str.localize(datetime.strptime(end_date, "%Y-%m-%d")) + timedelta(hours=23, minutes=59, seconds=59)
-    
-    start_timestamp = int(local_start_dt.astimezone(timezone.utc).timestamp())
-    end_timestamp = int(local_end_dt.astimezone(timezone.utc).timestamp())
 
+###################################################### gap repair #######################################################
+async def repair_history(city_name, key = API_key, max_concurrency=BACKFILL_MAX_CONCURRENCY):
+    """
+    Refetch only the missing hours of a city's stored history and merge them in.
+    Gaps the api still has no data for are recorded as known so they are not retried.
+    Returns the months that changed.
+    """
+    gaps = history_store.find_gaps(city_name)
+    if not gaps:
+        return []
+    latitude, longitude, timezone_str, error = await get_cordinates(city_name, key)
+    if latitude is None:
+        print(error)
+        return []
+    print(f"repairing {len(gaps)} gaps in {city_name} history")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def refetch(first_missing, last_missing):
+        async with semaphore:
+            return await fetch_history_window(
+                latitude, longitude, timezone_str,
+                local_to_utc_timestamp(first_missing, timezone_str),
+                local_to_utc_timestamp(last_missing, timezone_str),
+                key,
+            )
 
-    url = f"http://api.openweathermap.org/data/2.5/air_pollution/history?lat={latitude}&lon={longitude}&start={start_timestamp}&end={end_timestamp}&appid={key}"
+    results = await asyncio.gather(*(refetch(start, end) for start, end in gaps))
+    fetched = [(gap, df) for gap, df in zip(gaps, results) if isinstance(df, pd.DataFrame)]
+    changed = []
+    if any(not df.empty for _, df in fetched):
+        changed = history_store.append_history(city_name, pd.concat([df for _, df in fetched if not df.empty], ignore_index=True))
+
+    # whatever is still open inside a gap that was fetched fine has no upstream data: the whole gap,
+    # or the holes left when the api returned only part of it. Timestamp strings compare in time order
+    remaining = history_store.find_gaps(city_name)
+    unfillable = [
+        hole for hole in remaining
+        if any(start <= hole[0] and hole[1] <= end for (start, end), _ in fetched)
+    ]
+    if unfillable:
+        history_store.mark_known_gaps(city_name, unfillable)
+    filled = sum(
+        not any(start <= hole[0] and hole[1] <= end for hole in remaining) for (start, end), _ in fetched
+    )
+    print(f"{city_name}: {filled} gaps filled, {len(unfillable)} holes have no upstream data")
+    return changed
+
+
+#################################################### history backfill #######################################################
+def backfill_windows(start_timestamp, end_timestamp, window_hours=BACKFILL_WINDOW_HOURS):
+    """
+    Split [start_timestamp, end_timestamp] into consecutive, non-overlapping (start, end) epoch windows.
+    Windows are aligned on start_timestamp so a later run with a newer end reuses every full window.
+    """
+    step = window_hours * 3600
+    return [
+        (window_start, min(window_start + step - 1, end_timestamp))
+        for window_start in range(start_timestamp, end_timestamp + 1, step)
+    ]
 
-    response = requests.get(url)
 
-    if response.status_code == 200:
-        data = response.json()
-        
-        # Extract relevant data
-        records = []
-        for entry in data.get("list", []):
-            components = entry["components"]
-
-            # Convert UTC timestamp to local timezone
-            utc_time = datetime.fromtimestamp(entry["dt"], timezone.utc)
-            local_time = utc_time.astimezone(timezone_str)
-            readable_time = local_time.strftime('%Y-%m-%d %H:%M:%S')
-
-            records.append({
-                "Timestamp": readable_time,
-                "AQI": entry["main"]["aqi"],
-                "CO": components["co"],
-                "NO": components["no"],
-                "NO2": components["no2"],
-                "O3": components["o3"],
-                "SO2": components["so2"],
-                "PM2.5": components["pm2_5"],
-                "PM10": components["pm10"],
-                "NH3": components["nh3"]
-            })
-
-        for sub in ["air_quality_historic_data_csv", "models","predictions"]:
-            os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
-        
-        df = pd.DataFrame(records)
-        df = pd.concat([df_old, df], ignore_index=True)
-        df.to_csv(tmp_path, index=False)
-        print(f"Data saved to {tmp_path}")
-
-        await safe_upload(
-            tmp_path,
-            repo_id="mk12rule/pakistan_air_quality_dataset",
-            repo_type="dataset",
-            token=hf_token
-            )
+async def backfill_history(city_name, latitude, longitude, timezone_str, start_timestamp, end_timestamp,
+                           key = API_key, window_hours=BACKFILL_WINDOW_HOURS, max_concurrency=BACKFILL_MAX_CONCURRENCY):
+    """
+    Fetch a long history range as concurrent fixed-size windows and merge them in order.
+    Finished windows are checkpointed under BACKFILL_CHECKPOINT_DIR so an interrupted run
+    resumes with only the missing windows; the city's checkpoints are removed once the merge succeeds.
+    """
+    checkpoint_dir = os.path.join(BACKFILL_CHECKPOINT_DIR, city_name.lower())
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    windows = backfill_windows(start_timestamp, end_timestamp, window_hours)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_window(window_start, window_end):
+        checkpoint = os.path.join(checkpoint_dir, f"{window_start}_{window_end}.csv")
+        if os.path.exists(checkpoint):
+            return pd.read_csv(checkpoint)
+        async with semaphore:
+            df = await fetch_history_window(latitude, longitude, timezone_str, window_start, window_end, key)
+        if isinstance(df, pd.DataFrame):
+            # write then rename so a crash never leaves a half-written checkpoint behind
+            df.to_csv(checkpoint + ".tmp", index=False)
+            os.replace(checkpoint + ".tmp", checkpoint)
         return df
-    else:
-        return f"Error {response.status_code}: {response.text}"
+
+    results = await asyncio.gather(*(run_window(window_start, window_end) for window_start, window_end in windows))
+
+    failed = [r for r in results if not isinstance(r, pd.DataFrame)]
+    if failed:
+        print(f"Backfill for {city_name}: {len(failed)}/{len(windows)} windows failed, rerun to resume")
+        return failed[0]
+
+    print(f"Backfill for {city_name}: {len(windows)} windows fetched")
+    frames = [r for r in results if not r.empty] or [pd.DataFrame(columns=HISTORY_COLUMNS)]
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates("Timestamp", keep="last").reset_index(drop=True)
+    # clear the whole city directory: an interrupted run's last window is named after that
+    # run's end and would otherwise never be reused nor removed
+    for name in os.listdir(checkpoint_dir):
+        if name.endswith(".csv") or name.endswith(".csv.tmp"):
+            os.remove(os.path.join(checkpoint_dir, name))
+    return df
     
 
 
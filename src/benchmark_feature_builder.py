@@ -0,0 +1,66 @@
+# compares the strided numpy lag/target builder with the pandas shift+concat construction it replaced,
+# on every backup city csv: wall time, peak traced memory and equality of the produced matrices
+# run from the repo root: python -m src.benchmark_feature_builder
+import glob
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src.features import build_lag_matrix
+
+LAG_HOURS = 30
+FORECAST_HORIZON = 12
+
+##################################### old pandas construction #####################################
+def pandas_build(df, lag_hours=LAG_HOURS, forecast_horizon=FORECAST_HORIZON):
+    df['Date'] = pd.to_datetime(df["Timestamp"])
+    df.set_index('Date', inplace=True)
+    df = df.sort_index()
+    df = df[~df.index.duplicated(keep='last')].asfreq('h')
+    lag_features = []
+    for lag in range(1, lag_hours + 1):
+        for col in ['AQI', 'PM2.5', 'PM10', 'CO', 'NO', 'NO2', 'O3', 'SO2', 'NH3']:
+            lag_features.append(df[col].shift(lag).rename(f'{col}_lag_{lag}'))
+    df_lagged = pd.concat([df] + lag_features, axis=1)
+    target_features = [df['AQI'].shift(-h).rename(f'AQI_t+{h}') for h in range(1, forecast_horizon + 1)]
+    df = pd.concat([df_lagged] + target_features, axis=1)
+    df.dropna(inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    feature_cols = [col for col in df.columns if 'lag' in col]
+    target_cols = [col for col in df.columns if 'AQI_t+' in col]
+    return df[feature_cols].to_numpy(), df[target_cols].to_numpy()
+
+def numpy_build(df):
+    X, Y, _, _, _ = build_lag_matrix(df, LAG_HOURS, FORECAST_HORIZON)
+    return X, Y
+
+def measure(fn, df):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    X, Y = fn(df.copy())
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, X, Y
+
+##################################### compare #####################################
+rows = []
+for path in sorted(glob.glob("backup/air_quality_historic_data_csv/historical_air_pollution_all_*.csv")):
+    city = path.rsplit("_", 1)[-1][:-4]
+    df = pd.read_csv(path)
+    pandas_time, pandas_peak, X_old, Y_old = measure(pandas_build, df)
+    numpy_time, numpy_peak, X_new, Y_new = measure(numpy_build, df)
+    assert np.array_equal(X_old.astype(np.float32), X_new) and np.array_equal(Y_old.astype(np.float32), Y_new)
+    rows.append({
+        "city": city,
+        "rows": len(X_new),
+        "pandas_ms": round(pandas_time * 1000, 1),
+        "numpy_ms": round(numpy_time * 1000, 1),
+        "pandas_peak_mb": round(pandas_peak / 2**20, 1),
+        "numpy_peak_mb": round(numpy_peak / 2**20, 1),
+    })
+
+result = pd.DataFrame(rows)
+print(result.to_string(index=False))
+print(f"\nspeedup {result.pandas_ms.sum() / result.numpy_ms.sum():.1f}x, "
+      f"peak memory {result.pandas_peak_mb.mean() / result.numpy_peak_mb.mean():.1f}x lower")
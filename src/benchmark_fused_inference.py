@@ -0,0 +1,51 @@
+# single-row forecast latency of the fused all-horizon predictor against the MultiOutputRegressor.predict
+# call it replaces, on every local city model: p50/p99 over many calls and the largest prediction difference
+# run from the repo root: python -m src.benchmark_fused_inference
+import glob
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from src.data_loader import load_history_csv, history_csv_path
+from src.features import build_lag_matrix
+from src.fused_predictor import compile_model
+
+CALLS = 500
+
+def latencies_us(fn, rows):
+    fn(rows[0])
+    times = np.empty(CALLS)
+    for i in range(CALLS):
+        row = rows[i % len(rows)]
+        t0 = time.perf_counter()
+        fn(row)
+        times[i] = time.perf_counter() - t0
+    return np.percentile(times, [50, 99]) * 1e6
+
+##################################### compare #####################################
+rows = []
+for path in sorted(glob.glob("/tmp/models/xgboost_model_*.pkl") + glob.glob("backup/models/xgboost_model_*.pkl")):
+    city = os.path.basename(path)[len("xgboost_model_"):-4]
+    if os.path.getsize(path) < 1024 or not os.path.exists(history_csv_path(city)):
+        continue
+    model = joblib.load(path)
+    fused = compile_model(model)
+    X, _, _, names, _ = build_lag_matrix(load_history_csv(history_csv_path(city)), 30, 12)
+    frame = pd.DataFrame(X[-CALLS:], columns=names)[list(model.feature_names_in_)]
+    single_rows = [frame.iloc[[i]] for i in range(len(frame))]
+    old_p50, old_p99 = latencies_us(model.predict, single_rows)
+    new_p50, new_p99 = latencies_us(fused.predict, single_rows)
+    rows.append({
+        "model": path,
+        "trees": len(fused.roots),
+        "predict_p50_us": round(old_p50), "predict_p99_us": round(old_p99),
+        "fused_p50_us": round(new_p50), "fused_p99_us": round(new_p99),
+        "max_abs_diff": float(np.abs(fused.predict(frame) - model.predict(frame)).max()),
+    })
+    print(rows[-1])
+
+result = pd.DataFrame(rows)
+print(result.to_string(index=False))
+print(f"\np50 {result.predict_p50_us.sum() / result.fused_p50_us.sum():.1f}x faster, "
+      f"p99 {result.predict_p99_us.sum() / result.fused_p99_us.sum():.1f}x faster")
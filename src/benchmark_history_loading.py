@@ -0,0 +1,28 @@
+# compares a bare pd.read_csv (+ the to_datetime the consumers then ran) with the schema-aware
+# loader on the nine backup city csvs: parse time and in-memory size
+# run from the repo root: python -m src.benchmark_history_loading
+import time
+import pandas as pd
+from src.data_loader import history_csv_path, load_cities, memory_report
+
+CITIES = ["islamabad","rawalpindi","lahore","larkana","multan","peshawar","quetta","karachi","faisalabad"]
+
+##################################### bare read_csv #####################################
+t0 = time.perf_counter()
+bare = {}
+for city in CITIES:
+    df = pd.read_csv(history_csv_path(city))
+    df['Date'] = pd.to_datetime(df['Timestamp'])
+    bare[city] = df
+bare_time = time.perf_counter() - t0
+
+##################################### schema-aware loader #####################################
+t0 = time.perf_counter()
+compact = load_cities(CITIES)
+compact_time = time.perf_counter() - t0
+
+##################################### compare #####################################
+report = memory_report(bare).merge(memory_report(compact), on=["city", "rows"], suffixes=("_bare", "_compact"))
+print(report.to_string(index=False))
+print(f"\ntotal memory {report.memory_mb_bare.sum():.1f} MB -> {report.memory_mb_compact.sum():.1f} MB")
+print(f"total parse time {bare_time * 1000:.0f} ms -> {compact_time * 1000:.0f} ms")
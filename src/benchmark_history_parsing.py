@@ -0,0 +1,65 @@
+# compares parse_pollution_list with the per-row loop it replaced on a synthetic 30k-entry history payload
+# run from the repo root: python -m src.benchmark_history_parsing
+import time
+import numpy as np
+import pandas as pd
+import pytz
+from datetime import datetime, timezone
+from src.air_polution_data_get import parse_pollution_list
+
+N_ENTRIES = 30_000
+REPEATS = 5
+
+##################################### synthetic payload #####################################
+rng = np.random.default_rng(0)
+start = int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp())
+entries = [
+    {
+        "dt": start + 3600 * i,
+        "main": {"aqi": int(rng.integers(1, 6))},
+        "components": {k: round(float(v), 2) for k, v in zip(
+            ["co", "no", "no2", "o3", "so2", "pm2_5", "pm10", "nh3"], rng.uniform(0, 1000, 8))},
+    }
+    for i in range(N_ENTRIES)
+]
+tz = pytz.timezone("Asia/Karachi")
+
+##################################### old per-row loop #####################################
+def loop_parse(entries, timezone_str):
+    records = []
+    for entry in entries:
+        components = entry["components"]
+        utc_time = datetime.fromtimestamp(entry["dt"], timezone.utc)
+        local_time = utc_time.astimezone(timezone_str)
+        readable_time = local_time.strftime('%Y-%m-%d %H:%M:%S')
+        records.append({
+            "Timestamp": readable_time,
+            "AQI": entry["main"]["aqi"],
+            "CO": components["co"],
+            "NO": components["no"],
+            "NO2": components["no2"],
+            "O3": components["o3"],
+            "SO2": components["so2"],
+            "PM2.5": components["pm2_5"],
+            "PM10": components["pm10"],
+            "NH3": components["nh3"]
+        })
+    return pd.DataFrame(records)
+
+def best_of(fn):
+    times = []
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        result = fn(entries, tz)
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+##################################### compare #####################################
+loop_time, loop_df = best_of(loop_parse)
+vector_time, vector_df = best_of(parse_pollution_list)
+pd.testing.assert_frame_equal(loop_df, vector_df)
+
+print(f"{N_ENTRIES} entries, best of {REPEATS}")
+print(f"per-row loop : {loop_time * 1000:8.1f} ms")
+print(f"vectorized   : {vector_time * 1000:8.1f} ms")
+print(f"speedup      : {loop_time / vector_time:8.1f}x")
@@ -0,0 +1,68 @@
+# compares loading a city model from its joblib pickle (sklearn MultiOutputRegressor of XGBRegressors)
+# with loading the same boosters from the native booster artifact: cold load in a fresh interpreter
+# (imports included), warm reload in this process, file size, and equality of the predictions
+# run from the repo root: python -m src.benchmark_model_loading
+import glob
+import os
+import subprocess
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from src.booster_artifact import save_artifact, load_artifact, ARTIFACT_EXT
+from src.features import feature_names
+
+OUT_DIR = os.path.join("/tmp", "benchmark_artifacts")
+RUNS = 5
+
+COLD_PICKLE = "import time; t = time.perf_counter(); import joblib; joblib.load({path!r}); print(time.perf_counter() - t)"
+COLD_ARTIFACT = ("import time; t = time.perf_counter(); from src.booster_artifact import load_artifact; "
+                 "load_artifact({path!r}); print(time.perf_counter() - t)")
+
+def cold_ms(snippet, path):
+    times = [
+        float(subprocess.run([sys.executable, "-c", snippet.format(path=path)], capture_output=True, text=True, check=True).stdout)
+        for _ in range(RUNS)
+    ]
+    return round(np.median(times) * 1000, 1)
+
+def warm_ms(load, path):
+    load(path)
+    t0 = time.perf_counter()
+    for _ in range(RUNS):
+        load(path)
+    return round((time.perf_counter() - t0) / RUNS * 1000, 1)
+
+##################################### compare #####################################
+os.makedirs(OUT_DIR, exist_ok=True)
+rows = []
+paths = sorted(glob.glob("backup/models/xgboost_model_*.pkl") + glob.glob("/tmp/models/xgboost_model_*.pkl"))
+for pickle_path in paths:
+    if os.path.getsize(pickle_path) < 1024:
+        print(f"skipping {pickle_path}: {os.path.getsize(pickle_path)} byte stub")
+        continue
+    model = joblib.load(pickle_path)
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        names = feature_names(30)  # models from before lag selection were fitted on all 270 unnamed lags
+    artifact_path = os.path.join(OUT_DIR, os.path.basename(pickle_path)[:-4] + ARTIFACT_EXT)
+    save_artifact(model, artifact_path, feature_names=names)
+    X = pd.DataFrame(np.random.default_rng(0).uniform(0, 100, (64, len(names))).astype(np.float32), columns=list(names))
+    expected = model.predict(X if hasattr(model, "feature_names_in_") else X.to_numpy())
+    assert np.allclose(load_artifact(artifact_path).predict(X), expected, atol=1e-4)
+    rows.append({
+        "model": pickle_path,
+        "pickle_kb": os.path.getsize(pickle_path) // 1024,
+        "artifact_kb": os.path.getsize(artifact_path) // 1024,
+        "pickle_cold_ms": cold_ms(COLD_PICKLE, pickle_path),
+        "artifact_cold_ms": cold_ms(COLD_ARTIFACT, artifact_path),
+        "pickle_warm_ms": warm_ms(joblib.load, pickle_path),
+        "artifact_warm_ms": warm_ms(load_artifact, artifact_path),
+    })
+    print(rows[-1])
+
+result = pd.DataFrame(rows)
+print(result.to_string(index=False))
+print(f"\ncold load {result.pickle_cold_ms.sum() / result.artifact_cold_ms.sum():.1f}x faster, "
+      f"warm load {result.pickle_warm_ms.sum() / result.artifact_warm_ms.sum():.1f}x faster")
@@ -0,0 +1,61 @@
+# compares the per-horizon MultiOutputRegressor (12 XGBRegressors) with one native multi-target
+# XGBRegressor (vector-leaf trees) per city on a chronological 80/20 split of the backup csv files:
+# training time, pickled model size, single-row inference latency and test RMSE per horizon
+# run from the repo root: python -m src.benchmark_multi_output [city ...]
+import io
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.multioutput import MultiOutputRegressor
+from xgboost import XGBRegressor
+from src.data_loader import load_cities
+from src.features import build_lag_matrix
+from src.lag_selection import load_lag_config, selected_feature_names
+from src.model import XGB_PARAMS
+from src.training_pool import MULTI_OUTPUT_PARAMS
+
+LAG_HOURS = 30
+FORECAST_HORIZON = 12
+LATENCY_RUNS = 200
+
+def model_size(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+def latency_ms(model, row):
+    model.predict(row)
+    t0 = time.perf_counter()
+    for _ in range(LATENCY_RUNS):
+        model.predict(row)
+    return (time.perf_counter() - t0) / LATENCY_RUNS * 1000
+
+def evaluate(name, model, X_train, Y_train, X_test, Y_test):
+    t0 = time.perf_counter()
+    model.fit(X_train, Y_train)
+    fit_time = time.perf_counter() - t0
+    rmse = np.sqrt(((model.predict(X_test) - Y_test) ** 2).mean(axis=0))
+    return {"model": name, "fit_s": round(fit_time, 1), "size_kb": round(model_size(model) / 1024),
+            "predict_ms": round(latency_ms(model, X_test.iloc[:1]), 2),
+            **{f"rmse_t+{h + 1}": round(float(v), 3) for h, v in enumerate(rmse)}}
+
+##################################### compare #####################################
+cities = sys.argv[1:] or ["islamabad", "lahore", "karachi"]
+feature_cols = selected_feature_names(load_lag_config())
+rows = []
+for city, df in load_cities(cities).items():
+    X, Y, _, all_cols, _ = build_lag_matrix(df, LAG_HOURS, FORECAST_HORIZON)
+    X = pd.DataFrame(X[:, [all_cols.index(col) for col in feature_cols]], columns=feature_cols)
+    split = int(len(X) * 0.8)
+    data = (X.iloc[:split], Y[:split], X.iloc[split:], Y[split:])
+    for name, model in [("per_horizon", MultiOutputRegressor(XGBRegressor(**XGB_PARAMS))),
+                        ("multi_output", XGBRegressor(**XGB_PARAMS, **MULTI_OUTPUT_PARAMS))]:
+        rows.append({"city": city, **evaluate(name, model, *data)})
+        print(rows[-1])
+
+result = pd.DataFrame(rows)
+print(result[["city", "model", "fit_s", "size_kb", "predict_ms"]].to_string(index=False))
+print("\nmean test rmse per horizon")
+print(result.groupby("model")[[f"rmse_t+{h}" for h in range(1, FORECAST_HORIZON + 1)]].mean().round(3).T.to_string())
@@ -0,0 +1,78 @@
+import json
+import os
+import zipfile
+import numpy as np
+import xgboost as xgb
+
+# version independent model artifact: an uncompressed zip holding manifest.json and the boosters
+# in xgboost's native ubj format (booster_00.ubj ... one per horizon, or a single multi-target one).
+# Loading it needs only xgboost and numpy, no sklearn wrapper objects are unpickled
+ARTIFACT_EXT = ".xgb"
+FORMAT_VERSION = 1
+
+
+class BoosterModel:
+    """
+    The boosters of one artifact behind the small part of the sklearn interface predict uses:
+    feature_names_in_ and predict(X) -> (n, horizons).
+    """
+    def __init__(self, boosters, manifest):
+        self.boosters = boosters
+        self.manifest = manifest
+        self.feature_names_in_ = np.asarray(manifest["feature_names"], dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    def predict(self, X):
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        predictions = [np.asarray(booster.inplace_predict(X, validate_features=False)) for booster in self.boosters]
+        return np.column_stack(predictions) if len(predictions) > 1 else predictions[0].reshape(len(X), -1)
+
+
+def model_boosters(model):
+    """(kind, boosters) of a fitted MultiOutputRegressor of XGBRegressors or a multi-target XGBRegressor."""
+    if hasattr(model, "estimators_"):
+        return "per_horizon", [estimator.get_booster() for estimator in model.estimators_]
+    return "multi_output", [model.get_booster()]
+
+
+def save_artifact(model, path, lag_config=None, trained_till=None, target_names=None, feature_names=None):
+    """
+    Write a trained model as an artifact with its manifest (feature names, lag config, training timestamp).
+    feature_names is only needed for models fitted without column names.
+    """
+    kind, boosters = model_boosters(model)
+    if feature_names is None:
+        feature_names = model.feature_names_in_
+    manifest = {
+        "format": FORMAT_VERSION,
+        "kind": kind,
+        "feature_names": [str(name) for name in feature_names],
+        "target_names": target_names,
+        "lag_config": lag_config,
+        "trained_till": trained_till,
+        "xgboost_version": xgb.__version__,
+        "boosters": [f"booster_{i:02d}.ubj" for i in range(len(boosters))],
+    }
+    with zipfile.ZipFile(path + ".tmp", "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=1))
+        for name, booster in zip(manifest["boosters"], boosters):
+            archive.writestr(name, bytes(booster.save_raw("ubj")))
+    # readers never see a half written artifact
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def load_artifact(path, nthread=1):
+    """Load an artifact into a BoosterModel."""
+    with zipfile.ZipFile(path, "r") as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest["format"] > FORMAT_VERSION:
+            raise ValueError(f"{path} has artifact format {manifest['format']}, newer than {FORMAT_VERSION}")
+        boosters = []
+        for name in manifest["boosters"]:
+            booster = xgb.Booster(params={"nthread": nthread})
+            booster.load_model(bytearray(archive.read(name)))
+            boosters.append(booster)
+    return BoosterModel(boosters, manifest)
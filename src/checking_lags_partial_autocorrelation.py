@@ -1,7 +1,9 @@
+# run from the repo root: python -m src.checking_lags_partial_autocorrelation
 from statsmodels.graphics.tsaplots import plot_pacf  # Added for PACF
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+from src.data_loader import load_history_csv
 
 # Get the current script's directory
 current_dir = os.path.dirname(__file__)
@@ -10,16 +12,12 @@ csv_path = os.path.join(current_dir, '..', 'utils', 'air_quality_historic_data_c
 
 # Normalize the path
 csv_path = os.path.abspath(csv_path)
-# Read the CSV
-df = pd.read_csv(csv_path)
+# Read the CSV, only the pollutants plotted below (typed and already sorted by time)
+df = load_history_csv(csv_path, columns=['PM2.5', 'NO2', 'PM10', 'NH3', 'SO2', 'O3', 'NO', 'CO'])
 
 ##################################### PREPROCESSING time #####################################
-# Convert 'Date' to datetime
-df['Date'] = pd.to_datetime(df['Timestamp'])
-# Set 'Date' as index
-df.set_index('Date', inplace=True)
-# sorting by date
-df = df.sort_values('Timestamp')
+# Set the parsed timestamps as index
+df.set_index(df['Timestamp'].rename('Date'), inplace=True)
 
 ########################################## ploting ######################################
 plt.figure(figsize=(10, 4))
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+
+# one schema for every history frame: timestamps as datetime64[s] (or int64 epoch seconds),
+# the 1-5 AQI index as int8 and the pollutant concentrations as float32
+POLLUTANT_COLUMNS = ["CO", "NO", "NO2", "O3", "SO2", "PM2.5", "PM10", "NH3"]
+HISTORY_SCHEMA = {"Timestamp": "datetime64[s]", "AQI": "int8", **{col: "float32" for col in POLLUTANT_COLUMNS}}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+CSV_DIR = os.path.join("backup", "air_quality_historic_data_csv")
+
+
+def history_csv_path(city_name, folder=CSV_DIR):
+    return os.path.join(folder, f"historical_air_pollution_all_{city_name}.csv")
+
+
+def compact_history(df, timestamps="datetime"):
+    """
+    Cast a history frame to HISTORY_SCHEMA (only the columns it has).
+    timestamps="epoch" stores Timestamp as int64 seconds instead of datetime64[s].
+    """
+    df = df.copy()
+    if "Timestamp" in df:
+        if not np.issubdtype(df["Timestamp"].dtype, np.datetime64):
+            df["Timestamp"] = pd.to_datetime(df["Timestamp"], format=TIMESTAMP_FORMAT)
+        df["Timestamp"] = df["Timestamp"].astype("datetime64[s]")
+        if timestamps == "epoch":
+            df["Timestamp"] = df["Timestamp"].astype("int64")
+    if "AQI" in df and df["AQI"].dtype != np.int8:
+        df["AQI"] = df["AQI"].round().astype("int8")  # a handful of rows carry interpolated, fractional values
+    for col in POLLUTANT_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+################################################### csv loader #######################################################
+def load_history_csv(path, columns=None, timestamps="datetime"):
+    """
+    Read a historical air quality csv with the explicit schema, parsing only the requested
+    columns (Timestamp is always included) and returning them sorted by time.
+    """
+    usecols = ["Timestamp"] + [col for col in (columns or HISTORY_SCHEMA) if col != "Timestamp"]
+    # AQI is parsed as float32 first: the files write it as "5.0"
+    dtype = {col: "float32" for col in usecols if col != "Timestamp"}
+    df = pd.read_csv(path, usecols=usecols, dtype=dtype, engine="pyarrow")[usecols]
+    df = compact_history(df, timestamps=timestamps)
+    return df.sort_values("Timestamp", kind="stable").reset_index(drop=True)
+
+
+def load_cities(cities, folder=CSV_DIR, columns=None, timestamps="datetime"):
+    """Load several cities' csv files into {city: frame}, skipping cities without a file."""
+    frames = {}
+    for city in cities:
+        path = history_csv_path(city, folder)
+        if os.path.exists(path):
+            frames[city] = load_history_csv(path, columns=columns, timestamps=timestamps)
+        else:
+            print(f"no history csv for {city} at {path}")
+    return frames
+
+
+def memory_report(frames):
+    """Rows and in-memory size (MB) per city for a {city: frame} mapping."""
+    return pd.DataFrame([
+        {"city": city, "rows": len(df), "memory_mb": round(df.memory_usage(deep=True).sum() / 2**20, 2)}
+        for city, df in frames.items()
+    ])
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.features import LAG_COLUMNS, build_lag_matrix, hourly_grid, feature_names, target_names, format_times
+
+# built lag/target matrices per city and lag/horizon setting, as raw float32 files opened with np.memmap:
+#   /tmp/feature_cache/{city}/lag{L}_h{H}/{X,Y,times}.bin + meta.json
+# meta.json records the fingerprint of the source rows the matrices were built from, so appended
+# history only costs building the new rows and a changed history triggers a full rebuild
+CACHE_DIR = os.path.join("/tmp", "feature_cache")
+
+
+def cache_dir(city_name, lag_hours, forecast_horizon):
+    return os.path.join(CACHE_DIR, city_name.lower(), f"lag{lag_hours}_h{forecast_horizon}")
+
+
+def settings_fingerprint(lag_hours, forecast_horizon, columns=LAG_COLUMNS):
+    return hashlib.sha1(json.dumps([lag_hours, forecast_horizon, list(columns)]).encode()).hexdigest()
+
+
+def data_fingerprint(times, values):
+    """Hash of the hourly grid (times and values, NaN for missing hours) the matrices are built from."""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(times.astype("datetime64[s]")).tobytes())
+    digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def _read_meta(directory):
+    path = os.path.join(directory, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(path + ".tmp", path)
+
+
+def _append_rows(path, array, keep_rows, row_bytes):
+    """Append rows to a raw array file, first dropping anything past keep_rows (left by an interrupted append)."""
+    with open(path, "ab") as f:
+        f.truncate(keep_rows * row_bytes)
+        f.write(np.ascontiguousarray(array).tobytes())
+
+
+################################################### open / build #######################################################
+def open_feature_matrices(city_name, lag_hours=30, forecast_horizon=12):
+    """
+    Open a city's cached matrices read-only without touching the source data.
+    Returns (X, Y, times, feature names, target names) as memmaps, or None if nothing is cached.
+    """
+    directory = cache_dir(city_name, lag_hours, forecast_horizon)
+    meta = _read_meta(directory)
+    if meta is None or meta["settings"] != settings_fingerprint(lag_hours, forecast_horizon):
+        return None
+    n = meta["rows"]
+    if n == 0:
+        return (np.empty((0, meta["n_features"]), np.float32), np.empty((0, forecast_horizon), np.float32),
+                np.empty(0, "datetime64[s]"), feature_names(lag_hours), target_names(forecast_horizon))
+    X = np.memmap(os.path.join(directory, "X.bin"), dtype=np.float32, mode="r", shape=(n, meta["n_features"]))
+    Y = np.memmap(os.path.join(directory, "Y.bin"), dtype=np.float32, mode="r", shape=(n, forecast_horizon))
+    times = np.memmap(os.path.join(directory, "times.bin"), dtype="datetime64[s]", mode="r", shape=(n,))
+    return X, Y, times, feature_names(lag_hours), target_names(forecast_horizon)
+
+
+def get_feature_matrices(city_name, df, lag_hours=30, forecast_horizon=12):
+    """
+    Return the lag/target matrices of a city's history df, served from the memmap cache.
+    If df only appends rows to what the cache was built from, just the new rows are built and
+    appended; any other change rebuilds the cache. Same return value as open_feature_matrices.
+    """
+    directory = cache_dir(city_name, lag_hours, forecast_horizon)
+    os.makedirs(directory, exist_ok=True)
+    settings = settings_fingerprint(lag_hours, forecast_horizon)
+    grid_times, grid_values = hourly_grid(df)
+    meta = _read_meta(directory)
+
+    if meta is not None and meta["settings"] == settings:
+        cached_grid_rows = meta["grid_rows"]
+        prefix_matches = (
+            len(grid_times) >= cached_grid_rows
+            and data_fingerprint(grid_times[:cached_grid_rows], grid_values[:cached_grid_rows]) == meta["data"]
+        )
+        if prefix_matches and len(grid_times) == cached_grid_rows:
+            return open_feature_matrices(city_name, lag_hours, forecast_horizon)
+        if prefix_matches and meta["last_time"] is not None:
+            _extend(directory, meta, df, grid_times, grid_values, lag_hours, forecast_horizon)
+            return open_feature_matrices(city_name, lag_hours, forecast_horizon)
+
+    _rebuild(directory, settings, df, grid_times, grid_values, lag_hours, forecast_horizon)
+    return open_feature_matrices(city_name, lag_hours, forecast_horizon)
+
+
+def _rebuild(directory, settings, df, grid_times, grid_values, lag_hours, forecast_horizon):
+    X, Y, times, _, _ = build_lag_matrix(df, lag_hours, forecast_horizon)
+    for name, array in [("X", X), ("Y", Y), ("times", times.astype("datetime64[s]"))]:
+        path = os.path.join(directory, f"{name}.bin")
+        np.ascontiguousarray(array).tofile(path + ".tmp")
+        os.replace(path + ".tmp", path)
+    _write_meta(directory, {
+        "settings": settings,
+        "data": data_fingerprint(grid_times, grid_values),
+        "grid_rows": len(grid_times),
+        "rows": len(X),
+        "n_features": X.shape[1],
+        "last_time": format_times(times[-1:])[0] if len(times) else None,
+    })
+    print(f"feature cache rebuilt: {len(X)} rows in {directory}")
+
+
+def _extend(directory, meta, df, grid_times, grid_values, lag_hours, forecast_horizon):
+    # rows after the last cached one need their lag window before them; rows that
+    # lacked targets last time may be complete now, so rebuild from there
+    last_time = np.datetime64(meta["last_time"].replace(" ", "T"), "s")
+    source_times = pd.to_datetime(df["Timestamp"]).values.astype("datetime64[s]")
+    tail = df[source_times >= last_time - np.timedelta64(lag_hours, "h")]
+    X, Y, times, _, _ = build_lag_matrix(tail, lag_hours, forecast_horizon)
+    new = times > last_time
+    X, Y, times = X[new], Y[new], times[new].astype("datetime64[s]")
+
+    rows = meta["rows"]
+    _append_rows(os.path.join(directory, "X.bin"), X, rows, meta["n_features"] * 4)
+    _append_rows(os.path.join(directory, "Y.bin"), Y, rows, forecast_horizon * 4)
+    _append_rows(os.path.join(directory, "times.bin"), times, rows, 8)
+    meta.update({
+        "data": data_fingerprint(grid_times, grid_values),
+        "grid_rows": len(grid_times),
+        "rows": rows + len(X),
+        "last_time": format_times(times[-1:])[0] if len(times) else meta["last_time"],
+    })
+    _write_meta(directory, meta)
+    print(f"feature cache extended by {len(X)} rows in {directory}")
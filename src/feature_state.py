@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from src import history_store
+from src.features import LAG_COLUMNS, feature_names
+from src.air_polution_data_get import get_cordinates, fetch_history_window, local_to_utc_timestamp
+
+HOUR = np.timedelta64(1, "h")
+
+# city -> FeatureState, kept warm for the life of the process
+_states = {}
+
+
+class FeatureState:
+    """
+    Ring buffer holding the newest hourly observation of a city plus the lag_hours before it.
+    feature_vector() gives the same row feature_and_target_creation(df, lag_hours, 0) would
+    produce for the newest hour, without rebuilding anything from the full history.
+    """
+    def __init__(self, lag_hours=30, columns=LAG_COLUMNS):
+        self.lag_hours = lag_hours
+        self.columns = columns
+        self.size = lag_hours + 1
+        self.buffer = np.full((self.size, len(columns)), np.nan, dtype=np.float32)
+        self.head = 0           # slot the next hour is written to
+        self.last_time = None   # datetime64[s] of the newest hour held
+
+    def append(self, time, values):
+        """Add one hourly observation. Skipped hours are filled with NaN, older hours are ignored."""
+        time = np.datetime64(time, "s")
+        if self.last_time is not None:
+            if time < self.last_time:
+                return
+            if time == self.last_time:
+                # a corrected reading of the newest hour replaces it in place
+                self.buffer[(self.head - 1) % self.size] = values
+                return
+            missing = min(int((time - self.last_time) // HOUR) - 1, self.size)
+            for _ in range(missing):
+                self.buffer[self.head] = np.nan
+                self.head = (self.head + 1) % self.size
+        self.buffer[self.head] = values
+        self.head = (self.head + 1) % self.size
+        self.last_time = time
+
+    def extend(self, df):
+        """Append every row of a history frame (any order) to the buffer."""
+        if df is None or df.empty:
+            return
+        times = pd.to_datetime(df["Timestamp"]).values.astype("datetime64[s]")
+        values = df[self.columns].to_numpy(dtype=np.float32)
+        for i in np.argsort(times, kind="stable"):
+            self.append(times[i], values[i])
+
+    def is_ready(self):
+        """True when the newest hour and all its lags are present."""
+        return self.last_time is not None and not np.isnan(self.buffer).any()
+
+    def feature_vector(self):
+        """The 1 x (lag_hours * len(columns)) feature row for the newest hour, lag-major."""
+        lag_slots = (self.head - 2 - np.arange(self.lag_hours)) % self.size
+        return self.buffer[lag_slots].reshape(1, -1)
+
+    def feature_frame(self):
+        return pd.DataFrame(self.feature_vector(), columns=feature_names(self.lag_hours, self.columns))
+
+
+################################################### per-city state #######################################################
+def get_state(city_name, lag_hours=30):
+    """Return the city's state, seeding a new one from the newest locally stored history."""
+    city_name = city_name.lower()
+    state = _states.get(city_name)
+    if state is None or state.lag_hours != lag_hours:
+        state = FeatureState(lag_hours)
+        months = history_store.partitions(city_name)
+        if months:
+            state.extend(history_store.read_history(city_name, months=months[-2:]))
+        _states[city_name] = state
+    return state
+
+
+async def refresh_state(city_name, until, lag_hours=30):
+    """
+    Bring the city's state up to the local hour `until` (naive datetime), fetching only the
+    hours after the newest one it holds. Returns the state or an error string.
+    """
+    state = get_state(city_name, lag_hours)
+    until = until.replace(minute=0, second=0, microsecond=0)
+    if state.last_time is not None and state.last_time >= np.datetime64(until, "s"):
+        return state
+
+    if state.last_time is not None and state.last_time >= np.datetime64(until - timedelta(hours=state.size), "s"):
+        start = state.last_time.astype(datetime) + timedelta(hours=1)
+    else:
+        # cold or stale state: one buffer's worth of hours is all that is needed
+        start = until - timedelta(hours=state.size)
+
+    latitude, longitude, timezone_str, error = await get_cordinates(city_name)
+    if latitude is None:
+        return error
+    df = await fetch_history_window(
+        latitude, longitude, timezone_str,
+        local_to_utc_timestamp(start.strftime('%Y-%m-%dT%H:%M:%S'), timezone_str),
+        local_to_utc_timestamp(until.strftime('%Y-%m-%dT%H:%M:%S'), timezone_str),
+    )
+    if not isinstance(df, pd.DataFrame):
+        return df
+    state.extend(df)
+    return state
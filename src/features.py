@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+
+# pollutant columns in the order they appear inside each lag block of the feature matrix
+LAG_COLUMNS = ['AQI', 'PM2.5', 'PM10', 'CO', 'NO', 'NO2', 'O3', 'SO2', 'NH3']
+
+
+def feature_names(lag_hours=30, columns=LAG_COLUMNS):
+    """Feature column names, lag-major: AQI_lag_1, PM2.5_lag_1, ..., NH3_lag_{lag_hours}."""
+    return [f'{col}_lag_{lag}' for lag in range(1, lag_hours + 1) for col in columns]
+
+
+def target_names(forecast_horizon=12):
+    return [f'AQI_t+{h}' for h in range(1, forecast_horizon + 1)]
+
+
+def hourly_grid(df, columns=LAG_COLUMNS):
+    """
+    Put a history frame on a regular hourly grid.
+    Returns (grid times as datetime64[s], float32 values of columns with NaN rows for missing hours).
+    """
+    times = pd.to_datetime(df["Timestamp"]).values.astype("datetime64[s]")
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    # keep the last row of any duplicated hour, like drop_duplicates(keep='last')
+    keep = np.append(times[1:] != times[:-1], True)
+    times, rows = times[keep], order[keep]
+    values = df[columns].to_numpy(dtype=np.float32)[rows]
+
+    if len(times) == 0:
+        return times, values
+    grid = np.arange(times[0], times[-1] + np.timedelta64(1, "h"), np.timedelta64(1, "h"))
+    grid_values = np.full((len(grid), len(columns)), np.nan, dtype=np.float32)
+    grid_values[((times - times[0]) // np.timedelta64(1, "h")).astype(np.int64)] = values
+    return grid, grid_values
+
+
+def lag_view(values, lag_hours):
+    """
+    Strided, read-only view with view[j, k, c] == values[j + lag_hours - 1 - k, c],
+    i.e. view[i - lag_hours] holds the lag 1..lag_hours rows for grid row i, already in feature order.
+    """
+    n, n_cols = values.shape
+    row_stride, col_stride = values.strides
+    return as_strided(
+        values[lag_hours - 1:],
+        shape=(max(n - lag_hours + 1, 0), lag_hours, n_cols),
+        strides=(row_stride, -row_stride, col_stride),
+        writeable=False,
+    )
+
+
+################################################### matrix builder #######################################################
+def build_lag_matrix(df, lag_hours=30, forecast_horizon=12, columns=LAG_COLUMNS):
+    """
+    Build the lag feature matrix and the AQI target matrix straight from sliding-window views.
+    Rows whose lag window or targets touch a missing hour are dropped.
+    Returns (X float32 [rows, lag_hours * len(columns)], Y float32 [rows, forecast_horizon],
+    row times as datetime64[s], feature names, target names).
+    """
+    times, values = hourly_grid(df, columns)
+    values = np.ascontiguousarray(values)
+    n = len(times)
+    window = lag_hours + 1 + forecast_horizon
+
+    # a row is usable when no hour in [i - lag_hours, i + forecast_horizon] is missing
+    missing = np.isnan(values).any(axis=1)
+    missing_before = np.concatenate(([0], np.cumsum(missing)))
+    first = np.arange(max(n - window + 1, 0))
+    rows = first[missing_before[first + window] == missing_before[first]] + lag_hours
+
+    X = np.take(lag_view(values, lag_hours), rows - lag_hours, axis=0).reshape(len(rows), lag_hours * len(columns))
+    if forecast_horizon > 0:
+        aqi = np.ascontiguousarray(values[:, columns.index('AQI')])
+        Y = np.take(sliding_window_view(aqi, forecast_horizon), rows + 1, axis=0)
+    else:
+        Y = np.empty((len(rows), 0), dtype=np.float32)
+    return X, Y, times[rows], feature_names(lag_hours, columns), target_names(forecast_horizon)
+
+
+def format_times(times):
+    """datetime64 array -> "%Y-%m-%d %H:%M:%S" strings, the Timestamp format of the history files."""
+    return np.char.replace(np.datetime_as_string(times.astype("datetime64[s]"), unit="s"), "T", " ").astype(object)
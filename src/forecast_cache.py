@@ -0,0 +1,73 @@
+import asyncio
+import pandas as pd
+
+# forecasts of the current origin hour held in memory: city -> (origin point, (forecast frame, origin point)).
+# An entry only answers for its own origin hour, so it expires when the hour turns. Requests that miss
+# while the same (city, origin hour) is already being computed wait for that computation instead of
+# running their own: exactly one fetch-and-predict per city per hour
+_entries = {}
+_inflight = {}   # (city, origin point) -> future of the (result, origin point) being computed
+
+
+def _cacheable(value):
+    return isinstance(value[0], pd.DataFrame)
+
+
+def lookup(city_name, origin_point):
+    """The cached (forecast, origin point) of the city for this origin hour, or None."""
+    entry = _entries.get(city_name)
+    if entry is None:
+        return None
+    if entry[0] != origin_point:
+        del _entries[city_name]  # an earlier hour's forecast
+        return None
+    return entry[1]
+
+
+def claim(city_name, origin_point):
+    """
+    Start computing a city's forecast: returns (future, True) if the caller now owns the computation
+    and must finish() it, or (future of the computation already running, False).
+    """
+    key = (city_name, origin_point)
+    future = _inflight.get(key)
+    if future is not None:
+        return future, False
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    return future, True
+
+
+def finish(city_name, origin_point, value):
+    """Publish an owned computation's (result, origin point) to its waiters and cache it if it is a forecast."""
+    if _cacheable(value):
+        _entries[city_name] = (origin_point, value)
+    future = _inflight.pop((city_name, origin_point), None)
+    if future is not None and not future.done():
+        future.set_result(value)
+
+
+async def get_or_compute(city_name, origin_point, compute):
+    """The city's (result, origin point) for this hour: cached, awaited from a running computation, or computed."""
+    cached = lookup(city_name, origin_point)
+    if cached is not None:
+        return cached
+    future, owner = claim(city_name, origin_point)
+    if not owner:
+        return await asyncio.shield(future)
+    value = (None, None)
+    try:
+        value = await compute()
+    except asyncio.CancelledError:
+        value = ("forecast computation was cancelled", None)
+        raise
+    except Exception as e:
+        value = (str(e), None)
+        raise
+    finally:
+        finish(city_name, origin_point, value)
+    return value
+
+
+def clear():
+    _entries.clear()
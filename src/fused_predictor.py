@@ -0,0 +1,125 @@
+import json
+import numpy as np
+
+# all-horizon inference without xgboost: the trees of every horizon booster are flattened into one
+# set of node arrays and a row is routed through all of them at once, one numpy step per tree level.
+# Each node carries a (horizons,) leaf vector, zero outside the horizon its tree belongs to, so
+# summing the reached leaves gives the 12 forecasts in one go
+
+
+def _base_scores(learner, n_targets):
+    raw = learner["learner_model_param"]["base_score"].strip("[]")
+    scores = np.array([float(value) for value in raw.split(",")], dtype=np.float64)
+    return np.broadcast_to(scores, (n_targets,)).copy()
+
+
+def _booster_trees(booster):
+    """(base scores, [(tree json, target index or None for vector leaves)]) of one xgboost booster."""
+    learner = json.loads(bytes(booster.save_raw("json")))["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"):
+        raise ValueError(f"fused prediction needs an identity link objective, not {objective}")
+    n_targets = int(learner["learner_model_param"].get("num_target", "1"))
+    model = learner["gradient_booster"]["model"]
+    trees = []
+    for tree, target in zip(model["trees"], model["tree_info"]):
+        vector_leaf = int(tree["tree_param"]["size_leaf_vector"]) > 1
+        trees.append((tree, None if vector_leaf else target))
+    return _base_scores(learner, n_targets), n_targets, trees
+
+
+class FusedForecaster:
+    """
+    One model's boosters compiled to flat arrays. predict(X) -> (n, horizons) matches the boosters'
+    own predictions up to float rounding; feature_names_in_ is kept so predict can select the columns.
+    """
+    def __init__(self, boosters, feature_names):
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        parsed = [_booster_trees(booster) for booster in boosters]
+        # per-horizon boosters are single-target, a multi-target booster covers every horizon itself
+        self.n_outputs = len(boosters) if len(boosters) > 1 else parsed[0][1]
+        self.base = np.concatenate([base for base, _, _ in parsed]) if len(boosters) > 1 else parsed[0][0]
+
+        feature, threshold, left, right, default_left, leaves, roots = [], [], [], [], [], [], []
+        offset, depth = 0, 1
+        for index, (_, _, trees) in enumerate(parsed):
+            for tree, target in trees:
+                n = int(tree["tree_param"]["num_nodes"])
+                lc = np.asarray(tree["left_children"], dtype=np.int64)
+                rc = np.asarray(tree["right_children"], dtype=np.int64)
+                is_leaf = lc == -1
+                nodes = np.arange(n)
+                # leaves point at themselves, so extra routing steps leave a finished row in place
+                left.append(np.where(is_leaf, nodes, lc) + offset)
+                right.append(np.where(is_leaf, nodes, rc) + offset)
+                feature.append(np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int64)))
+                threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+                default_left.append(np.asarray(tree["default_left"], dtype=bool))
+                values = np.zeros((n, self.n_outputs), dtype=np.float64)
+                if target is None:
+                    size = int(tree["tree_param"]["size_leaf_vector"])
+                    values[is_leaf] = np.asarray(tree["base_weights"], dtype=np.float64).reshape(n, size)[is_leaf]
+                else:
+                    column = index if len(boosters) > 1 else target
+                    values[is_leaf, column] = np.asarray(tree["split_conditions"], dtype=np.float64)[is_leaf]
+                leaves.append(values)
+                roots.append(offset)
+                depth = max(depth, _tree_depth(lc, rc))
+                offset += n
+
+        self.feature = np.concatenate(feature)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        self.default_left = np.concatenate(default_left)
+        self.leaves = np.concatenate(leaves)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.depth = depth
+
+    def predict_array(self, X):
+        """(n, features) float32 array in feature_names_in_ order -> (n, horizons)."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            value = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(value), self.default_left[node], value < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.base + self.leaves[node].sum(axis=1)
+
+    def predict(self, X):
+        if hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float32)
+        return self.predict_array(X)
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while frontier:
+        depth += 1
+        frontier = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+    return depth - 1
+
+
+def compile_model(model):
+    """
+    A FusedForecaster of a pickled MultiOutputRegressor / multi-target XGBRegressor or a
+    booster_artifact.BoosterModel; models it cannot compile are returned unchanged.
+    """
+    if hasattr(model, "boosters"):
+        boosters = model.boosters
+    elif hasattr(model, "estimators_"):
+        boosters = [estimator.get_booster() for estimator in model.estimators_]
+    elif hasattr(model, "get_booster"):
+        boosters = [model.get_booster()]
+    else:
+        return model
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        return model
+    try:
+        return FusedForecaster(boosters, names)
+    except ValueError as e:
+        print(f"Not fusing model: {e}")
+        return model
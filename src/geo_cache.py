@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from timezonefinder import TimezoneFinder
+
+GEO_CACHE_PATH = os.path.join("/tmp", "geo_cache.json")
+GEO_CACHE_TTL = 30 * 24 * 3600  # seconds before a looked-up city is geocoded again
+
+# the cities we train models for never need a geocoding call
+SEEDED_CITIES = {
+    "islamabad": (33.6938, 73.0652, "Asia/Karachi"),
+    "rawalpindi": (33.5973, 73.0479, "Asia/Karachi"),
+    "lahore": (31.5656, 74.3142, "Asia/Karachi"),
+    "larkana": (27.5570, 68.2264, "Asia/Karachi"),
+    "multan": (30.1979, 71.4725, "Asia/Karachi"),
+    "peshawar": (34.0084, 71.5785, "Asia/Karachi"),
+    "quetta": (30.1920, 67.0070, "Asia/Karachi"),
+    "karachi": (24.8608, 67.0104, "Asia/Karachi"),
+    "faisalabad": (31.4155, 73.0897, "Asia/Karachi"),
+}
+
+_memory = None            # city -> {"lat", "lon", "tz", "fetched_at"}
+_timezone_finder = None   # loading the polygon data is expensive, build it once
+
+
+def _key(city_name):
+    return city_name.strip().lower()
+
+
+def _load():
+    """Populate the in-process cache from disk on first use."""
+    global _memory
+    if _memory is None:
+        _memory = {}
+        if os.path.exists(GEO_CACHE_PATH):
+            try:
+                with open(GEO_CACHE_PATH, "r") as f:
+                    _memory = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading geo cache {GEO_CACHE_PATH}: {e}")
+    return _memory
+
+
+def _save():
+    tmp_path = GEO_CACHE_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(_memory, f)
+        os.replace(tmp_path, GEO_CACHE_PATH)
+    except OSError as e:
+        print(f"Error writing geo cache {GEO_CACHE_PATH}: {e}")
+
+
+################################################### lookup / store #######################################################
+def lookup(city_name):
+    """
+    Return (latitude, longitude, timezone name) for a cached city or None if unknown or expired.
+    """
+    key = _key(city_name)
+    if key in SEEDED_CITIES:
+        return SEEDED_CITIES[key]
+    entry = _load().get(key)
+    if entry is None or time.time() - entry["fetched_at"] > GEO_CACHE_TTL:
+        return None
+    return entry["lat"], entry["lon"], entry["tz"]
+
+
+def store(city_name, latitude, longitude, timezone_name):
+    """Remember a geocoded city in memory and on disk."""
+    _load()[_key(city_name)] = {
+        "lat": latitude,
+        "lon": longitude,
+        "tz": timezone_name,
+        "fetched_at": time.time(),
+    }
+    _save()
+
+
+def timezone_at(latitude, longitude):
+    """Resolve the timezone name of a coordinate with the shared TimezoneFinder, falling back to UTC."""
+    global _timezone_finder
+    if _timezone_finder is None:
+        _timezone_finder = TimezoneFinder()
+    return _timezone_finder.timezone_at(lng=longitude, lat=latitude) or "UTC"
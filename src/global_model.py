@@ -0,0 +1,57 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBRegressor
+from src.training_pool import training_rows, assemble_model, boost_estimator, MULTI_OUTPUT_PARAMS
+
+# one pooled model over the stacked feature rows of every city; the city enters as its
+# coordinates, so a city that has no model (or no history) of its own can still be served
+GLOBAL_MODEL_NAME = "xgboost_model_global"  # + .pkl / booster_artifact.ARTIFACT_EXT
+CITY_FEATURES = ["latitude", "longitude"]
+# "city": per-city models, global as fallback; "global": always the global model
+PREDICT_MODEL = os.getenv("PREDICT_MODEL", "city")
+TRAIN_GLOBAL = os.getenv("TRAIN_GLOBAL", "0") == "1"
+
+
+def is_global(model):
+    return all(col in getattr(model, "feature_names_in_", []) for col in CITY_FEATURES)
+
+
+def with_city_features(X, latitude, longitude):
+    """The lag feature frame of one city plus its coordinate columns."""
+    return X.assign(latitude=np.float32(latitude), longitude=np.float32(longitude))
+
+
+def stacked_rows(coordinates, feature_cols, lag_hours=30, forecast_horizon=12):
+    """
+    The cached feature rows of every city in {city: (latitude, longitude)} stacked into one
+    (X DataFrame with the coordinate columns appended, Y).
+    """
+    frames, targets = [], []
+    for city, (latitude, longitude) in coordinates.items():
+        X, Y = training_rows(city, feature_cols, lag_hours, forecast_horizon)
+        frames.append(with_city_features(X, latitude, longitude))
+        targets.append(np.asarray(Y))
+    return pd.concat(frames, ignore_index=True), np.concatenate(targets)
+
+
+def fit_global_model(coordinates, feature_cols, params, lag_hours=30, forecast_horizon=12, threads=1, model_type="per_horizon"):
+    """
+    Fit the pooled model of the given cities, of the same kind training() builds per city.
+    Returns (model, wall seconds).
+    """
+    start = time.time()
+    X_train, Y = stacked_rows(coordinates, feature_cols, lag_hours, forecast_horizon)
+    if model_type == "multi_output":
+        model = XGBRegressor(**{**params, **MULTI_OUTPUT_PARAMS, "n_jobs": threads})
+        model.fit(X_train, Y)
+        return model, time.time() - start
+    # one quantized matrix shared by the horizon boosters, as in training_pool.fit_horizons
+    dtrain = xgb.QuantileDMatrix(X_train, label=Y[:, 0], max_bin=params.get("max_bin"), nthread=threads)
+    estimators = []
+    for horizon in range(forecast_horizon):
+        dtrain.set_label(Y[:, horizon])
+        estimators.append(boost_estimator(XGBRegressor(**{**params, "n_jobs": threads}), dtrain))
+    return assemble_model(estimators, list(X_train.columns), params), time.time() - start
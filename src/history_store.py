@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from huggingface_hub import HfApi, hf_hub_download
+from src.data_loader import compact_history, load_history_csv
+
+# history lives as one compressed parquet file per city and (local) month:
+#   /tmp/history_store/{city}/{YYYY-MM}.parquet  <->  history/{city}/{YYYY-MM}.parquet on the dataset repo
+# rows are kept in the data_loader schema (datetime64 Timestamp, int8 AQI, float32 pollutants)
+# appending a few hours only rewrites (and re-uploads) the current month
+STORE_DIR = os.path.join("/tmp", "history_store")
+DATASET_REPO = "mk12rule/pakistan_air_quality_dataset"
+REPO_PREFIX = "history"
+COMPRESSION = "zstd"
+
+
+def known_gaps_path(city_name):
+    return os.path.join(city_dir(city_name), "known_gaps.json")
+
+
+def city_dir(city_name):
+    return os.path.join(STORE_DIR, city_name.lower())
+
+
+def partition_path(city_name, month):
+    return os.path.join(city_dir(city_name), f"{month}.parquet")
+
+
+def repo_path(city_name, month):
+    return f"{REPO_PREFIX}/{city_name.lower()}/{month}.parquet"
+
+
+def partitions(city_name):
+    """Sorted list of the months stored locally for a city."""
+    if not os.path.isdir(city_dir(city_name)):
+        return []
+    return sorted(f[:-len(".parquet")] for f in os.listdir(city_dir(city_name)) if f.endswith(".parquet"))
+
+
+def _format_timestamps(times):
+    times = np.asarray(times).astype("datetime64[s]")
+    return np.char.replace(np.datetime_as_string(times, unit="s"), "T", " ").astype(object)
+
+
+def _write_partition(path, stored):
+    stored = compact_history(stored).drop_duplicates("Timestamp", keep="last").sort_values("Timestamp")
+    # write then rename so readers never see a half-written partition
+    stored.to_parquet(path + ".tmp", compression=COMPRESSION, index=False)
+    os.replace(path + ".tmp", path)
+
+
+################################################### read / append #######################################################
+def read_history(city_name, months=None):
+    """
+    Read every partition (or only the given months) of a city into one DataFrame ordered by time,
+    in the data_loader schema, or None if nothing is stored.
+    """
+    months = partitions(city_name) if months is None else months
+    if not months:
+        return None
+    frames = [pd.read_parquet(partition_path(city_name, m)) for m in months]
+    return compact_history(pd.concat(frames, ignore_index=True))
+
+
+def last_timestamp(city_name):
+    """Newest stored Timestamp ("%Y-%m-%d %H:%M:%S") of a city, reading only the last partition."""
+    months = partitions(city_name)
+    if not months:
+        return None
+    last = pd.read_parquet(partition_path(city_name, months[-1]), columns=["Timestamp"])
+    return _format_timestamps(last["Timestamp"].values[-1:])[0]
+
+
+def append_history(city_name, df):
+    """
+    Merge new rows into the city's month partitions, deduplicating on Timestamp.
+    Only the months touched by df are rewritten; returns their months.
+    """
+    if df is None or df.empty:
+        return []
+    os.makedirs(city_dir(city_name), exist_ok=True)
+    stored = compact_history(df)
+    months = stored["Timestamp"].values.astype("datetime64[M]").astype(str)
+    changed = []
+    for month, rows in stored.groupby(months, sort=True):
+        path = partition_path(city_name, month)
+        if os.path.exists(path):
+            rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+        _write_partition(path, rows)
+        changed.append(month)
+    return changed
+
+
+###################################################### gap index #########################################################
+def find_gaps(city_name, include_known=False):
+    """
+    Index the holes in a city's hourly series as (first_missing, last_missing) local timestamp strings.
+    Ranges already refetched without result (see mark_known_gaps) are skipped unless include_known is set.
+    """
+    months = partitions(city_name)
+    if not months:
+        return []
+    frames = [pd.read_parquet(partition_path(city_name, m), columns=["Timestamp"]) for m in months]
+    times = np.unique(pd.concat(frames, ignore_index=True)["Timestamp"].values.astype("datetime64[s]"))
+    hour = np.timedelta64(1, "h")
+    breaks = np.nonzero(np.diff(times) > hour)[0]
+    if len(breaks) == 0:
+        return []
+    starts = _format_timestamps(times[breaks] + hour)
+    ends = _format_timestamps(times[breaks + 1] - hour)
+    gaps = [(str(start), str(end)) for start, end in zip(starts, ends)]
+    if include_known:
+        return gaps
+    known = set(map(tuple, _read_known_gaps(city_name)))
+    return [gap for gap in gaps if gap not in known]
+
+
+def mark_known_gaps(city_name, gaps):
+    """Record gaps the api has no data for, so later repairs do not refetch them."""
+    known = {tuple(gap) for gap in _read_known_gaps(city_name)} | {tuple(gap) for gap in gaps}
+    os.makedirs(city_dir(city_name), exist_ok=True)
+    with open(known_gaps_path(city_name), "w") as f:
+        json.dump(sorted(known), f)
+
+
+def _read_known_gaps(city_name):
+    if not os.path.exists(known_gaps_path(city_name)):
+        return []
+    with open(known_gaps_path(city_name), "r") as f:
+        return json.load(f)
+
+
+##################################################### hub sync #########################################################
+def pull(city_name, token=None):
+    """
+    Bring the local store up to date with the dataset repo: partitions missing locally are
+    downloaded and the newest remote partition is merged into the local copy.
+    Returns the months that changed locally.
+    """
+    prefix = f"{REPO_PREFIX}/{city_name.lower()}/"
+    try:
+        remote = sorted(
+            f for f in HfApi(token=token).list_repo_files(DATASET_REPO, repo_type="dataset")
+            if f.startswith(prefix) and f.endswith(".parquet")
+        )
+    except Exception as e:
+        print(f"Error: {e}")
+        print(f"could not list {city_name} partitions on hf hub, using local store")
+        return []
+
+    local = set(partitions(city_name))
+    months = [f[len(prefix):-len(".parquet")] for f in remote]
+    wanted = [m for m in months if m not in local]
+    if months and months[-1] in local:
+        wanted.append(months[-1])
+
+    os.makedirs(city_dir(city_name), exist_ok=True)
+    changed = []
+    for month in wanted:
+        try:
+            downloaded = hf_hub_download(
+                repo_id=DATASET_REPO,
+                filename=repo_path(city_name, month),
+                repo_type="dataset",
+                cache_dir="/tmp/.cache",
+                token=token,
+            )
+        except Exception as e:
+            print(f"Error: {e}")
+            continue
+        path = partition_path(city_name, month)
+        if os.path.exists(path):
+            merged = pd.concat([pd.read_parquet(downloaded), pd.read_parquet(path)], ignore_index=True)
+            _write_partition(path, merged)
+        else:
+            shutil.copyfile(downloaded, path)
+        changed.append(month)
+    return changed
+
+
+def import_csv(city_name, csv_path):
+    """Seed a city's store from a legacy historical_air_pollution_all_{city}.csv file."""
+    return append_history(city_name, load_history_csv(csv_path))
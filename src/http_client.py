@@ -0,0 +1,174 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import httpx
+
+OPENWEATHER_BASE_URL = "http://api.openweathermap.org"
+MAX_CONNECTIONS = 10            # sockets kept open towards openweather
+MAX_KEEPALIVE_CONNECTIONS = 10
+MAX_CONCURRENT_REQUESTS = 8     # requests in flight at once, per event loop
+DEFAULT_TIMEOUT = httpx.Timeout(20.0, connect=5.0)
+
+# openweather plan quota. The bucket is per process, so the processes start.sh runs side by side
+# split it: the streamlit ui keeps UI_RATE_SHARE, a training worker TRAINING_RATE_SHARE while it
+# runs and the api the rest. A process that does not set its share (the cli) uses the whole quota
+CALLS_PER_MINUTE = int(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+BURST = int(os.getenv("OPENWEATHER_BURST", "10"))
+UI_RATE_SHARE = float(os.getenv("UI_RATE_SHARE", "0.2"))
+TRAINING_RATE_SHARE = float(os.getenv("TRAINING_RATE_SHARE", "0.5"))
+API_RATE_SHARE = 1.0 - UI_RATE_SHARE
+
+# retry policy for 429 / 5xx responses and transport errors
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0   # seconds, doubled per attempt
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# one client per event loop: the api runs a single loop, but streamlit and the
+# cli call asyncio.run() repeatedly and a client cannot outlive its loop
+_clients = {}
+
+
+################################################### rate limiting #######################################################
+class TokenBucket:
+    """
+    Process-wide token bucket. Callers reserve a token under a thread lock (the bucket is shared
+    across event loops) and then sleep asynchronously until their reservation comes due.
+    """
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """Take one token, possibly going negative, and return how long to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            _count("throttled")
+            _count("throttled_seconds", wait)
+            await asyncio.sleep(wait)
+
+
+rate_limiter = TokenBucket(CALLS_PER_MINUTE / 60.0, BURST)
+
+
+def quota_share(share):
+    """(calls per minute, burst) of a share of the plan quota, at least one call each."""
+    return max(1, int(CALLS_PER_MINUTE * share)), max(1, int(BURST * share))
+
+
+def set_rate_share(share):
+    """Resize this process's bucket to its share of the plan quota."""
+    calls_per_minute, burst = quota_share(share)
+    with rate_limiter.lock:
+        rate_limiter.rate = calls_per_minute / 60.0
+        rate_limiter.capacity = burst
+        rate_limiter.tokens = min(rate_limiter.tokens, burst)
+
+_stats = {
+    "requests": 0,             # attempts sent upstream, retries included
+    "retries": 0,
+    "throttled": 0,            # calls delayed by the local rate limiter
+    "throttled_seconds": 0.0,
+    "rate_limited": 0,         # 429 responses
+    "server_errors": 0,        # 5xx responses
+    "transport_errors": 0,     # timeouts and connection failures
+    "failed": 0,               # calls that still failed after all retries
+}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    """Snapshot of the upstream call and throttling counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def backoff_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a Retry-After header when the server sends one."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(BACKOFF_CAP, float(retry_after))
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+################################################### shared client #######################################################
+def _loop_state():
+    """
+    Return the (client, semaphore) pair bound to the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    state = _clients.get(loop)
+    if state is None or state[0].is_closed:
+        # forget clients whose loop is gone, their sockets die with the loop
+        for stale_loop in [l for l in _clients if l.is_closed()]:
+            _clients.pop(stale_loop, None)
+        client = httpx.AsyncClient(
+            base_url=OPENWEATHER_BASE_URL,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        state = (client, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS))
+        _clients[loop] = state
+    return state
+
+
+async def get(path, params=None, timeout=None, retries=MAX_RETRIES):
+    """
+    GET an openweather endpoint through the pooled client, under the shared rate limit.
+    429, 5xx and transport errors are retried with jittered exponential backoff; after the
+    last attempt the final response is returned, or the final httpx.HTTPError raised.
+    """
+    client, semaphore = _loop_state()
+    for attempt in range(retries + 1):
+        await rate_limiter.acquire()
+        _count("requests")
+        try:
+            async with semaphore:
+                response = await client.get(path, params=params, timeout=timeout or DEFAULT_TIMEOUT)
+        except httpx.TransportError as e:
+            _count("transport_errors")
+            if attempt == retries:
+                _count("failed")
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⚠️ {path} attempt {attempt + 1} failed ({e!r}), retrying in {delay:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            _count("rate_limited" if response.status_code == 429 else "server_errors")
+            if attempt == retries:
+                _count("failed")
+                return response
+            delay = backoff_delay(attempt, response)
+            print(f"⚠️ {path} returned {response.status_code}, retrying in {delay:.1f}s")
+        _count("retries")
+        await asyncio.sleep(delay)
+
+
+async def close_client():
+    """Close the client bound to the running event loop (call on shutdown)."""
+    state = _clients.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state[0].aclose()
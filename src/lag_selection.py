@@ -0,0 +1,84 @@
+# headless PACF lag selection: computes the partial autocorrelation of every pollutant for every city
+# in parallel, keeps the lags that are significant in most cities and writes them to lag_config.json,
+# which training and predict read to pick their lag features
+# run from the repo root: python -m src.lag_selection
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.stattools import pacf
+from src.data_loader import load_cities
+from src.features import LAG_COLUMNS, hourly_grid
+
+LAG_CONFIG_PATH = os.getenv("LAG_CONFIG_PATH", "lag_config.json")
+MAX_LAG = 30
+ALPHA_Z = 1.96      # two-sided 95% band of the pacf, +-z / sqrt(n)
+MIN_PACF = 0.05     # with ~30k hourly rows the band is tiny, so also require a practically relevant size
+MIN_CITY_SHARE = 0.5
+CITIES = ["islamabad","rawalpindi","lahore","larkana","multan","peshawar","quetta","karachi","faisalabad"]
+
+
+def default_lag_config(max_lag=MAX_LAG):
+    """Every lag of every column: the feature set used before lag selection."""
+    return {col: list(range(1, max_lag + 1)) for col in LAG_COLUMNS}
+
+
+def load_lag_config(path=LAG_CONFIG_PATH, max_lag=MAX_LAG):
+    """{column: sorted lags} from the config file, or the full default when there is none."""
+    if not os.path.exists(path):
+        return default_lag_config(max_lag)
+    with open(path, "r") as f:
+        config = json.load(f)["lags"]
+    return {col: sorted(lag for lag in config.get(col, []) if lag <= max_lag) for col in LAG_COLUMNS}
+
+
+def selected_feature_names(config, max_lag=MAX_LAG):
+    """Feature names of a lag config, in the lag-major order of features.feature_names."""
+    return [f'{col}_lag_{lag}' for lag in range(1, max_lag + 1) for col in LAG_COLUMNS if lag in config[col]]
+
+
+################################################### pacf per city #######################################################
+def significant_lags(series, max_lag=MAX_LAG):
+    """Lags whose PACF lies outside the confidence band and above MIN_PACF."""
+    series = series[~np.isnan(series)]
+    values = pacf(series, nlags=max_lag, method="ywm")[1:]
+    threshold = max(ALPHA_Z / np.sqrt(len(series)), MIN_PACF)
+    return [lag for lag, value in enumerate(values, start=1) if abs(value) > threshold]
+
+
+def city_lags(df, max_lag=MAX_LAG):
+    """{column: significant lags} of one city's history, computed on the hourly grid."""
+    _, values = hourly_grid(df)
+    return {col: significant_lags(values[:, i].astype(np.float64), max_lag) for i, col in enumerate(LAG_COLUMNS)}
+
+
+def select_lags(frames, max_lag=MAX_LAG, min_city_share=MIN_CITY_SHARE, workers=None):
+    """
+    Run the per-city PACF analysis in a process pool and keep, per column, the lags significant
+    in at least min_city_share of the cities. Lag 1 is always kept.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        per_city = dict(zip(frames, pool.map(city_lags, frames.values(), [max_lag] * len(frames))))
+    config = {}
+    for col in LAG_COLUMNS:
+        votes = np.zeros(max_lag + 1)
+        for lags in per_city.values():
+            votes[lags[col]] += 1
+        config[col] = sorted({1} | {lag for lag in range(1, max_lag + 1) if votes[lag] >= min_city_share * len(frames)})
+    return config, per_city
+
+
+def save_lag_config(config, per_city, path=LAG_CONFIG_PATH):
+    with open(path, "w") as f:
+        json.dump({"max_lag": MAX_LAG, "min_pacf": MIN_PACF, "min_city_share": MIN_CITY_SHARE,
+                   "lags": config, "per_city": per_city}, f, indent=1)
+
+
+if __name__ == '__main__':
+    frames = load_cities(CITIES, columns=LAG_COLUMNS)
+    config, per_city = select_lags(frames)
+    save_lag_config(config, per_city)
+    n_features = sum(len(lags) for lags in config.values())
+    for col, lags in config.items():
+        print(f"{col:6s} {lags}")
+    print(f"{n_features} features instead of {MAX_LAG * len(LAG_COLUMNS)}, saved to {LAG_CONFIG_PATH}")
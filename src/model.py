@@ -1,11 +1,20 @@
 import pandas as pd
 import numpy as np
-from xgboost import XGBRegressor
 from datetime import datetime, timedelta
 import os
-from sklearn.multioutput import MultiOutputRegressor
 from dotenv import load_dotenv,find_dotenv
-from src.air_polution_data_get import get_history_data, update_history_data,safe_upload
+from src.air_polution_data_get import update_history_data, UploadBatch, get_cordinates
+from src.features import build_lag_matrix, format_times
+from src.feature_state import FeatureState, refresh_state
+from src.feature_cache import get_feature_matrices
+from src.lag_selection import load_lag_config, selected_feature_names
+from src.training_pool import fit_city_models, CPU_BUDGET, THREADS_PER_WORKER, MODEL_TYPE, INCREMENTAL_ROUNDS
+from src.retrain_planner import load_state, record, needs_training
+from src.global_model import fit_global_model, with_city_features, is_global, GLOBAL_MODEL_NAME, PREDICT_MODEL, TRAIN_GLOBAL
+from src import model_registry, forecast_cache
+from src.geo_cache import SEEDED_CITIES
+from src.booster_artifact import save_artifact, ARTIFACT_EXT
+from sklearn.multioutput import MultiOutputRegressor
 import joblib
 import argparse
 import pytz
@@ -18,77 +27,194 @@ hf_token = os.getenv("HF_TOKEN")
 
  
 def feature_and_target_creation(df, lag_hours=30, forecast_horizon=12):
-    # PREPROCESSING time 
-    # Convert 'Date' to datetime
-    df['Date'] = pd.to_datetime(df["Timestamp"])
-    # Set 'Date' as index
-    df.set_index('Date', inplace=True)
-    # sorting by date
-    df = df.sort_values('Timestamp')
-
-    # Create lag features
-    lag_features = []
-    for lag in range(1, lag_hours + 1):
-        for col in ['AQI', 'PM2.5', 'PM10', 'CO', 'NO', 'NO2', 'O3', 'SO2', 'NH3']: 
-            lag_col = df[col].shift(lag)
-            lag_features.append(lag_col.rename(f'{col}_lag_{lag}'))
-
-    df_lagged = pd.concat([df] + lag_features, axis=1)
-
-    # Create forecast targets
-    target_features = [df['AQI'].shift(-h).rename(f'AQI_t+{h}') for h in range(1, forecast_horizon + 1)]
-    df = pd.concat([df_lagged] + target_features, axis=1)
-
-    # Drop NaNs and reset index
-    df.dropna(inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # Define features and target variable
-    feature_cols = [col for col in df.columns if 'lag' in col]
-    target_cols = [col for col in df.columns if 'AQI_t+' in col]
-
+    """
+    Lag features and AQI targets as a DataFrame; thin wrapper over features.build_lag_matrix.
+    Lags and targets are counted in hours, rows touching a missing hour are dropped.
+    """
+    X, Y, times, feature_cols, target_cols = build_lag_matrix(df, lag_hours, forecast_horizon)
+    df = pd.concat(
+        [
+            pd.DataFrame({"Timestamp": format_times(times)}),
+            pd.DataFrame(X, columns=feature_cols),
+            pd.DataFrame(Y, columns=target_cols),
+        ],
+        axis=1,
+    )
     return df,feature_cols,target_cols
 
 
-async def training():
+# base learner of every horizon model
+XGB_PARAMS = dict(
+    n_estimators=50, 
+    learning_rate=0.1,
+    max_depth=4,
+    subsample=0.8,
+    colsample_bytree=0.8,
+    n_jobs=-1,
+    verbosity=0
+)
+
+# incremental retraining: continue the previous boosters on the rows since the last run (plus one
+# lag window of already seen rows) and refit from scratch once the last full refit is FULL_REFIT_DAYS
+# old in data time or the boosters have grown to MAX_BOOSTED_ROUNDS
+INCREMENTAL = os.getenv("TRAIN_INCREMENTAL", "0") == "1"
+FULL_REFIT_DAYS = int(os.getenv("TRAIN_FULL_REFIT_DAYS", "7"))
+MAX_BOOSTED_ROUNDS = 4 * XGB_PARAMS["n_estimators"]
+TRAINING_LOCK_PATH = os.path.join("/tmp", "models", ".training.lock")
+
+
+def model_files(name):
+    """The /tmp/models files of a model: the pickle (kept for warm starts) and the native booster artifact served from."""
+    return [os.path.join("/tmp", "models", name + extension) for extension in [".pkl", ARTIFACT_EXT]]
+
+
+def training_lock():
+    """
+    Lock TRAINING_LOCK_PATH without waiting: the open lock file (closing it releases the lock), or None
+    if another run holds it. fcntl does not exist on Windows, where msvcrt locks the file's first byte.
+    """
+    lock = open(TRAINING_LOCK_PATH, "w")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def save_model(model, name, trained_till=None):
+    """
+    Write a model as pickle and as booster artifact; each is written next to its destination and
+    moved into place, so readers and killed runs never see half a file. Returns the paths.
+    """
+    pickle_path, artifact_path = model_files(name)
+    joblib.dump(model, pickle_path + ".tmp")
+    os.replace(pickle_path + ".tmp", pickle_path)
+    save_artifact(model, artifact_path, lag_config=load_lag_config(), trained_till=trained_till)
+    return [pickle_path, artifact_path]
+
+
+def _read_timestamp(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return pd.Timestamp(f.read().strip())
+
+
+def warm_start_plan(city, model_type, feature_cols, lag_hours=30):
+    """
+    (since, previous model) to continue the city's last trained model from, or None when
+    the city needs a full refit.
+    """
+    model_path = model_files(f"xgboost_model_{city}")[0]
+    last_trained = _read_timestamp(os.path.join("/tmp", "models", f"{city}_last_trained_timestamp.txt"))
+    last_full = _read_timestamp(os.path.join("/tmp", "models", f"{city}_last_full_refit_timestamp.txt"))
+    if not os.path.exists(model_path) or last_trained is None or last_full is None:
+        print(f"{city}: full refit, no previous incremental state")
+        return None
+    if last_trained - last_full >= pd.Timedelta(days=FULL_REFIT_DAYS):
+        print(f"{city}: full refit, last one trained till {last_full}")
+        return None
+    model = joblib.load(model_path)
+    if isinstance(model, MultiOutputRegressor) != (model_type == "per_horizon"):
+        print(f"{city}: full refit, previous model is not {model_type}")
+        return None
+    if list(getattr(model, "feature_names_in_", [])) != list(feature_cols):
+        print(f"{city}: full refit, lag features changed")
+        return None
+    booster = (model.estimators_[0] if isinstance(model, MultiOutputRegressor) else model).get_booster()
+    if booster.num_boosted_rounds() + INCREMENTAL_ROUNDS > MAX_BOOSTED_ROUNDS:
+        print(f"{city}: full refit, boosters reached {booster.num_boosted_rounds()} rounds")
+        return None
+    since = last_trained - pd.Timedelta(hours=lag_hours)
+    return since.strftime("%Y-%m-%d %H:%M:%S"), model
+
+
+async def training(cpu_budget=CPU_BUDGET, threads_per_worker=THREADS_PER_WORKER, model_type=MODEL_TYPE,
+                   incremental=INCREMENTAL, force=False, train_global=TRAIN_GLOBAL):
     # Load data
     cities = ["islamabad","rawalpindi","lahore","larkana","multan","peshawar","quetta","karachi","faisalabad"]
-    
-    for city in cities:
-        df = await update_history_data(city_name=city)
-        # Feature creation
-        df,feature_cols,target_cols = feature_and_target_creation(df, lag_hours=30, forecast_horizon=12)
-    
-        X_train = df[feature_cols]
-        Y_train = df[target_cols]
-        
-        # Train MultiOutput XGBoost
-        base_model = XGBRegressor(
-            n_estimators=50, 
-            learning_rate=0.1,
-            max_depth=4,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            n_jobs=-1,
-            verbosity=0
-        )
-        
-        multi_model = MultiOutputRegressor(base_model)
-        multi_model.fit(X_train, Y_train)
+    # one training at a time per machine: overlapping runs would write the same /tmp/models files
+    os.makedirs(os.path.join("/tmp", "models"), exist_ok=True)
+    lock = training_lock()
+    if lock is None:
+        print("Another training run is in progress, not starting a second one.")
+        return "training already running"
+    # everything this run produces goes to the hub as one commit per repo
+    uploads = UploadBatch()
+    try:
+        await _train_cities(cities, uploads, cpu_budget, threads_per_worker, model_type, incremental, force, train_global)
+    finally:
+        await uploads.commit(hf_token, message="Retrain city models")
+        lock.close()
+
+    print("Retraining finished:", {city: entry["status"] for city, entry in load_state().items()})
+
+async def _train_cities(cities, uploads, cpu_budget, threads_per_worker, model_type, incremental, force, train_global):
+    # bring every city's history and feature cache up to date (i/o bound, runs concurrently)
+    histories = await asyncio.gather(
+        *(update_history_data(city_name=city, repair=True, uploads=uploads) for city in cities), return_exceptions=True
+    )
+    state = load_state()
+    last_rows = {}
+    newest_rows = {}
+    for city, df in zip(cities, histories):
+        if not isinstance(df, pd.DataFrame):
+            print(f"Skipping {city}: {df}")
+            record(city, "failed", error=str(df))
+            continue
+        # Feature creation (memory-mapped, only rows appended since the last run are built)
+        _, _, times, _, _ = get_feature_matrices(city, df, lag_hours=30, forecast_horizon=12)
+        newest_rows[city] = times[-1:]
+        train, reason = needs_training(city, times, force=force, state=state)
+        print(f"{city}: {'training' if train else 'skipping'} ({reason})")
+        if train:
+            last_rows[city] = times[-1:]
+        else:
+            record(city, "skipped")
+            # re-offer the current model: the batch skips it when the hub copy matches, so
+            # an upload that failed on an earlier run is retried without retraining
+            for model_file in model_files(f"xgboost_model_{city}"):
+                if os.path.exists(model_file):
+                    uploads.add(model_file, repo_id="mk12rule/pakistan_air_quality_models", repo_type="model")
+    del histories
+
+    # keep only the lags chosen by the pacf lag selection (all 30 of every column without a config)
+    selected_cols = selected_feature_names(load_lag_config())
+    warm_starts = {}
+    if incremental:
+        for city in last_rows:
+            plan = warm_start_plan(city, model_type, selected_cols)
+            if plan is not None:
+                warm_starts[city] = plan
+    # Train the XGBoost models of every city across a process pool, off the event loop
+    models, wall_times, failures = await asyncio.to_thread(
+        fit_city_models, list(last_rows), selected_cols, XGB_PARAMS, 30, 12, cpu_budget, threads_per_worker, model_type,
+        warm_starts
+    )
+    for city, error in failures.items():
+        print(f"Training {city} failed: {error}")
+        record(city, "failed", error=error)
+
+    for city, multi_model in models.items():
         for sub in ["air_quality_historic_data_csv", "models"]:
             os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
-        model_name = os.path.join("/tmp", "models", f"xgboost_model_{city}.pkl")
-        joblib.dump(multi_model, model_name)
-        print(f"Model for {city} trained successfully.")
-
-        await safe_upload(
-            model_name,
-            repo_id="mk12rule/pakistan_air_quality_models",
-            repo_type="model",
-            token=hf_token
-            )
+        last_timestamp = format_times(last_rows[city])[0]
+        model_name, artifact_name = save_model(multi_model, f"xgboost_model_{city}", trained_till=last_timestamp)
+        print(f"Model for {city} trained successfully in {wall_times[city]:.1f}s.")
+
+        for model_file in [model_name, artifact_name]:
+            uploads.add(
+                model_file,
+                repo_id="mk12rule/pakistan_air_quality_models",
+                repo_type="model",
+                )
             
-        last_timestamp = df['Timestamp'].iloc[-1]
         # Save it to a file
         for sub in ["air_quality_historic_data_csv", "models","predictions"]:
             os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
@@ -97,50 +223,65 @@ async def training():
             f.write(str(last_timestamp))
             print(f"Model for {city} saved as {model_name}")
             print("model trained till",last_timestamp)
+        if city not in warm_starts:
+            with open(os.path.join("/tmp", "models", f"{city}_last_full_refit_timestamp.txt"), "w") as f:
+                f.write(str(last_timestamp))
+        record(city, "trained", trained_till=last_timestamp)
 
-    print("All models trained successfully.")
-
-async def predict( city_name = 'rawalpindi'):
+    if train_global and newest_rows and (last_rows or force or not os.path.exists(model_files(GLOBAL_MODEL_NAME)[0])):
+        global_time = await _train_global(newest_rows, uploads, selected_cols, model_type, cpu_budget)
+        if global_time is not None:
+            wall_times["global"] = global_time
 
-    for sub in ["air_quality_historic_data_csv", "models","predictions"]:
-            os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
+    print(pd.Series(wall_times, name="wall_seconds").round(1).to_string())
 
-    city_name = city_name.lower()
-    last_origin_path = os.path.join("/tmp", "predictions", f"{city_name}_last_origin_point.txt")
-    pridictions_file = os.path.join("/tmp", "predictions", f"predictions_{city_name}.csv")
-    # Paths for model and data files
+async def _train_global(newest_rows, uploads, selected_cols, model_type, cpu_budget):
+    # one pooled model over every city with a feature cache, the city encoded by its coordinates
+    coordinates = {}
+    for city in newest_rows:
+        latitude, longitude, _, error = await get_cordinates(city)
+        if latitude is None:
+            print(f"Leaving {city} out of the global model: {error}")
+            continue
+        coordinates[city] = (latitude, longitude)
     try:
-
-        model_path = hf_hub_download(
-        repo_id="mk12rule/pakistan_air_quality_models",
-        filename=f"xgboost_model_{city_name}.pkl",
-        cache_dir="/tmp/.cache"
+        model, wall_time = await asyncio.to_thread(
+            fit_global_model, coordinates, selected_cols, XGB_PARAMS, 30, 12, cpu_budget, model_type
         )
-        print(f"Model for {city_name} downloaded from Hugging Face at {model_path}")
-
     except Exception as e:
-        print(f"Error: {e}")
-        file_path = os.path.join("/tmp", "models", f"xgboost_model_{city_name}.pkl")
-        print(f"Checking for local model at {file_path}")
-        backup_path = f"backup/models/xgboost_model_{city_name}.pkl"
-        if os.path.exists(file_path):
-            model_path = file_path
-            print(f"Using local model at {model_path}")
-                
-        elif os.path.exists(backup_path) :
-            print(f"Local model not found. Checking backup at {backup_path}")
-            backup_path = f"backup/models/xgboost_model_{city_name}.pkl"
-            print(f"Using backup model at {backup_path}")
-            model_path = backup_path
-        else :
-            print("no file in backup folder")
+        print(f"Training the global model failed: {e}")
+        record("global", "failed", error=str(e))
+        return None
+    trained_till = max(format_times(newest_rows[city])[0] for city in coordinates)
+    model_name, artifact_name = save_model(model, GLOBAL_MODEL_NAME, trained_till=trained_till)
+    for model_file in [model_name, artifact_name]:
+        uploads.add(model_file, repo_id="mk12rule/pakistan_air_quality_models", repo_type="model")
+    record("global", "trained", trained_till=trained_till)
+    print(f"Global model over {len(coordinates)} cities trained in {wall_time:.1f}s, saved as {model_name}")
+    return wall_time
+
+async def _model_for(city_name):
+    # the city's own model unless the global one is preferred, the global model for cities
+    # without one; served from the in-memory registry, loaded only on its first use. Only the
+    # seeded cities are trained, so any other name goes straight to the global model instead of
+    # costing hub lookups and a registry _missing entry per unknown name
+    model = None
+    if PREDICT_MODEL != "global" and city_name in SEEDED_CITIES:
+        model = await model_registry.get_model(f"xgboost_model_{city_name}")
+    if model is None:
+        model = await model_registry.get_model(GLOBAL_MODEL_NAME)
+    return model
 
+def _origin_point():
     # Load the origin i-e current timestamp
     tz = pytz.timezone("Asia/Karachi")
     origin_point = datetime.now(tz)
-    origin_point = origin_point.replace(minute=0, second=0, microsecond=0)
-    
-    
+    return origin_point.replace(minute=0, second=0, microsecond=0)
+
+def _cached_prediction(city_name, origin_point):
+    """The forecast already made for this origin hour, or None."""
+    last_origin_path = os.path.join("/tmp", "predictions", f"{city_name}_last_origin_point.txt")
+    pridictions_file = os.path.join("/tmp", "predictions", f"predictions_{city_name}.csv")
     # Check if the last origin point file exists
     if os.path.exists(last_origin_path):
         # load the last origin point from the file
@@ -149,62 +290,163 @@ async def predict( city_name = 'rawalpindi'):
             print(last_origin, origin_point)
             if last_origin == origin_point:
                 # If the last origin is the same as the current, return the previous predictions
-                df = pd.read_csv(pridictions_file)
-                return df, origin_point
-    
-    
-    #days defore current timestamp
-    starting_point = origin_point - timedelta(days=4)
-    #convert to string format
-    origin_point_str = origin_point.strftime('%Y-%m-%dT%H:%M:%S')
-    starting_point_str = starting_point.strftime('%Y-%m-%dT%H:%M:%S')
+                return pd.read_csv(pridictions_file)
+    return None
+
+async def _model_input(city_name, model, origin_point):
+    """(1-row feature frame in the model's columns, state), or an error string."""
+    # bring the rolling lag state up to the current hour, fetching only the new hours
+    state = await refresh_state(city_name, origin_point.replace(tzinfo=None), lag_hours=30)
+    if not isinstance(state, FeatureState):
+        return state
+    if not state.is_ready():
+        return "not enough recent hourly data to build the lag features"
+    # the lags the model was trained on; models from before lag selection carry all 270.
+    # pickled MultiOutputRegressor / XGBRegressor models and booster artifacts all predict a (1, 12) array
+    model_cols = getattr(model, "feature_names_in_", None)
+    X_input = state.feature_frame()
+    if is_global(model):
+        latitude, longitude, _, error = await get_cordinates(city_name)
+        if latitude is None:
+            return error
+        X_input = with_city_features(X_input, latitude, longitude)
+    X_input = X_input[list(model_cols) if model_cols is not None else selected_feature_names(load_lag_config())]
+    return X_input, state
+
+def _store_prediction(city_name, Y_pred, state, origin_point):
+    """The forecast frame of one prediction row, saved as the forecast of this origin hour."""
+    #coverting prediction to int and from row to column
+    Y_pred = np.rint(Y_pred).astype(int).flatten()
+    #getting last timestamp from the original data
+    origin_time = pd.Timestamp(state.last_time)
+    #creating the forecast hours for prediction
+    forecast_hours = pd.date_range(start= origin_time + pd.Timedelta(hours=1), periods=12, freq='h')
+    #joining the forecast hours with the prediction
+    pred_df = pd.DataFrame({
+        "Timestamp": forecast_hours,
+        "AQI": Y_pred
+    })
+
+    #saving pred data frame
+    pred_df.to_csv(os.path.join("/tmp", "predictions", f"predictions_{city_name}.csv"), index=False)
+    # Save the origin point
+    with open(os.path.join("/tmp", "predictions", f"{city_name}_last_origin_point.txt"), "w") as f:
+        f.write(origin_point.isoformat())
+    return pred_df
+
+async def predict( city_name = 'rawalpindi'):
+
+    for sub in ["air_quality_historic_data_csv", "models","predictions"]:
+            os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
+
+    city_name = city_name.lower()
+    origin_point = _origin_point()
+    # served from memory within the hour; concurrent misses share one computation
+    return await forecast_cache.get_or_compute(city_name, origin_point, lambda: _predict(city_name, origin_point))
+
+async def _predict(city_name, origin_point):
+    # the files only matter after a restart, every later hit is answered from memory
+    cached = _cached_prediction(city_name, origin_point)
+    if cached is not None:
+        return cached, origin_point
+    model = await _model_for(city_name)
     
     # Check if the model exists
-    if(not os.path.exists(model_path)):
+    if model is None:
         return "model not trained yet or does not exist", origin_point
-    else:
-        # Load the model
-        model = joblib.load(model_path)
-        #getting the data from api
-        df = await get_history_data(start_date=starting_point_str, end_date=origin_point_str, city_name= city_name, mode="Data" )
-        if not isinstance(df, pd.DataFrame):
-            return df, None  # Return the error message and None
-        df = df.sort_values("Timestamp").reset_index(drop=True)
-        # creating the features
-        df,feature_cols,target_cols = feature_and_target_creation(df, lag_hours=30, forecast_horizon=0)
-        # # Load the last row of the DataFrame
-        X_input = df[feature_cols].iloc[-1:]
-        #model prediction
-        Y_pred = model.predict(X_input)
-        #coverting prediction to int and from row to column
-        Y_pred = np.rint(Y_pred).astype(int).flatten()
-        #getting last timestamp from the original data
-        origin_time = pd.to_datetime(df['Timestamp'].iloc[-1])
-        #creating the forecast hours for prediction
-        forecast_hours = pd.date_range(start= origin_time + pd.Timedelta(hours=1), periods=12, freq='h')
-        #joining the forecast hours with the prediction
-        pred_df = pd.DataFrame({
-            "Timestamp": forecast_hours,
-            "AQI": Y_pred
-        })
-    
-        #saving pred data frame
-        for sub in ["air_quality_historic_data_csv", "models"]:
-            os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
-        pred_df.to_csv(pridictions_file, index=False)
-        # Save the origin point
-        with open(last_origin_path, "w") as f:
-            f.write(origin_point.isoformat())
-        return pred_df, origin_point
+    prepared = await _model_input(city_name, model, origin_point)
+    if isinstance(prepared, str):
+        return prepared, None  # Return the error message and None
+    X_input, state = prepared
+    #model prediction
+    Y_pred = model.predict(X_input)
+    return _store_prediction(city_name, Y_pred, state, origin_point), origin_point
+
+async def predict_many(city_names):
+    """
+    Forecasts of several cities in one go: inputs are fetched concurrently and every model
+    predicts all the rows it serves in one batch (one call for all cities on the global model).
+    Cities cached or already being computed for this hour are not computed again.
+    Returns ({city: forecast frame or error string}, origin point).
+    """
+    for sub in ["models","predictions"]:
+        os.makedirs(os.path.join("/tmp", sub), exist_ok=True)
+    city_names = list(dict.fromkeys(city.lower() for city in city_names))
+    origin_point = _origin_point()
+    results = {}
+    waiting = {}
+    pending = []
+    for city_name in city_names:
+        cached = forecast_cache.lookup(city_name, origin_point)
+        if cached is not None:
+            results[city_name] = cached[0]
+            continue
+        future, owner = forecast_cache.claim(city_name, origin_point)
+        if owner:
+            pending.append(city_name)
+        else:
+            waiting[city_name] = future
+
+    computed = {}
+    try:
+        computed = await _predict_batch(pending, origin_point)
+    finally:
+        for city_name in pending:
+            forecast_cache.finish(city_name, origin_point, (computed.get(city_name, "forecast computation failed"), origin_point))
+    results.update(computed)
+    for city_name, future in waiting.items():
+        results[city_name] = (await asyncio.shield(future))[0]
+    return {city_name: results[city_name] for city_name in city_names}, origin_point
+
+async def _predict_batch(city_names, origin_point):
+    results = {}
+    pending = []
+    for city_name in city_names:
+        cached = _cached_prediction(city_name, origin_point)
+        if cached is not None:
+            results[city_name] = cached
+        else:
+            pending.append(city_name)
+
+    models = dict(zip(pending, await asyncio.gather(*(_model_for(city_name) for city_name in pending))))
+    served = []
+    for city_name, model in models.items():
+        if model is None:
+            results[city_name] = "model not trained yet or does not exist"
+        else:
+            served.append(city_name)
+    prepared = await asyncio.gather(
+        *(_model_input(city_name, models[city_name], origin_point) for city_name in served), return_exceptions=True
+    )
+    batches = {}  # id(model) -> (model, [(city, X_input, state)])
+    for city_name, item in zip(served, prepared):
+        if isinstance(item, (BaseException, str)):
+            results[city_name] = str(item)
+        else:
+            model = models[city_name]
+            batches.setdefault(id(model), (model, []))[1].append((city_name, *item))
+
+    for model, items in batches.values():
+        Y_pred = model.predict(pd.concat([X_input for _, X_input, _ in items], ignore_index=True))
+        for (city_name, _, state), row in zip(items, Y_pred):
+            results[city_name] = _store_prediction(city_name, row, state, origin_point)
+    return results
         
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="give arg action the following values: train or predict")
     parser.add_argument("action", type=str, help="train or predict")
     parser.add_argument("--city", type=str, help="Optional city name for prediction")
+    parser.add_argument("--cpu-budget", type=int, default=CPU_BUDGET, help="Cores training may use")
+    parser.add_argument("--threads-per-worker", type=int, default=THREADS_PER_WORKER, help="Threads per training worker")
+    parser.add_argument("--model-type", choices=["per_horizon", "multi_output"], default=MODEL_TYPE, help="Model kind to train")
+    parser.add_argument("--incremental", action="store_true", default=INCREMENTAL, help="Continue the previous models on new rows")
+    parser.add_argument("--force", action="store_true", help="Train every city, even without new rows")
+    parser.add_argument("--global-model", action="store_true", default=TRAIN_GLOBAL, help="Also train the pooled cross-city model")
     args = parser.parse_args()
     if args.action == "train":
-        asyncio.run(training())
+        asyncio.run(training(args.cpu_budget, args.threads_per_worker, args.model_type, args.incremental, args.force,
+                             args.global_model))
     if args.action == "predict":
         predictions = asyncio.run(predict(city_name = args.city if args.city else 'Rawalpindi'))
         print(predictions)
\ No newline at end of file
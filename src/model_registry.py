@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+import joblib
+from huggingface_hub import hf_hub_download
+from src.geo_cache import SEEDED_CITIES
+from src.global_model import GLOBAL_MODEL_NAME
+from src.booster_artifact import ARTIFACT_EXT, load_artifact
+from src.fused_predictor import compile_model
+
+# models kept loaded in the serving process: name -> (model, path, mtime), least recently used first.
+# A name ("xgboost_model_lahore") resolves to its native booster artifact when there is one and to
+# the legacy pickle otherwise. The API preloads every city model at startup, and watch() swaps in the
+# file a retrain writes to /tmp/models as soon as it is newer than the loaded one, so requests only
+# ever read memory
+MODEL_DIR = os.path.join("/tmp", "models")
+REGISTRY_SIZE = int(os.getenv("MODEL_REGISTRY_SIZE", "12"))
+WATCH_INTERVAL = int(os.getenv("MODEL_REGISTRY_WATCH_SECONDS", "30"))
+MISSING_RETRY_SECONDS = 300
+PRELOAD_MODELS = [f"xgboost_model_{city}" for city in SEEDED_CITIES] + [GLOBAL_MODEL_NAME]
+EXTENSIONS = [ARTIFACT_EXT, ".pkl"]  # in order of preference
+
+_models = OrderedDict()
+_missing = {}          # name -> time it was last found missing
+
+
+def find_model(filename):
+    """Path of a model file: the hub copy, else the local one from the last training, else the backup; None if missing."""
+    try:
+        model_path = hf_hub_download(
+        repo_id="mk12rule/pakistan_air_quality_models",
+        filename=filename,
+        cache_dir="/tmp/.cache"
+        )
+        print(f"Model {filename} downloaded from Hugging Face at {model_path}")
+        return model_path
+    except Exception as e:
+        print(f"Error: {e}")
+    file_path = os.path.join(MODEL_DIR, filename)
+    print(f"Checking for local model at {file_path}")
+    backup_path = os.path.join("backup", "models", filename)
+    if os.path.exists(file_path):
+        print(f"Using local model at {file_path}")
+        return file_path
+    if os.path.exists(backup_path):
+        print(f"Using backup model at {backup_path}")
+        return backup_path
+    print("no file in backup folder")
+    return None
+
+
+def _read(path):
+    """Load a model file of either format (blocking) and compile it into the fused all-horizon predictor."""
+    return compile_model(load_artifact(path) if path.endswith(ARTIFACT_EXT) else joblib.load(path))
+
+
+def _load(name, path=None):
+    """Load a model (blocking), preferring its native artifact. Returns (model, path, mtime) or None."""
+    if path is None:
+        for extension in EXTENSIONS:
+            path = find_model(name + extension)
+            if path is not None:
+                break
+    if path is None:
+        return None
+    return _read(path), path, os.path.getmtime(path)
+
+
+def _newest_local(name):
+    """Path of the newest /tmp/models file of a model, of either format, or None."""
+    paths = [os.path.join(MODEL_DIR, name + extension) for extension in EXTENSIONS]
+    paths = [path for path in paths if os.path.exists(path)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def _put(name, entry):
+    _models[name] = entry
+    _models.move_to_end(name)
+    while len(_models) > REGISTRY_SIZE:
+        evicted, _ = _models.popitem(last=False)
+        print(f"Model registry full, evicted {evicted}")
+
+
+async def get_model(name):
+    """The model stored under name, loaded off the event loop on a miss; None if there is none."""
+    entry = _models.get(name)
+    if entry is not None:
+        _models.move_to_end(name)
+        return entry[0]
+    if time.time() - _missing.get(name, 0) < MISSING_RETRY_SECONDS:
+        return None
+    try:
+        entry = await asyncio.to_thread(_load, name)
+    except Exception as e:
+        # a corrupt or truncated file is treated like a missing one, so it cannot stop the API starting
+        print(f"Model registry could not load {name}: {e}")
+        entry = None
+    if entry is None:
+        _missing[name] = time.time()
+        return None
+    _missing.pop(name, None)
+    _put(name, entry)
+    return entry[0]
+
+
+async def preload(names=PRELOAD_MODELS):
+    """Load the given models into the registry; called once when the API starts."""
+    for name in names[:REGISTRY_SIZE]:
+        await get_model(name)
+    print(f"Model registry preloaded {len(_models)} models")
+
+
+async def reload_changed():
+    """
+    Swap in every model whose newest /tmp/models file is newer than the loaded version. The new
+    model is loaded in a thread and replaces the old one in a single assignment.
+    """
+    swapped = []
+    for name in list(_models) + [name for name in _missing if name not in _models]:
+        local_path = _newest_local(name)
+        if local_path is None:
+            continue
+        loaded = _models.get(name)
+        if loaded is not None and loaded[2] >= os.path.getmtime(local_path):
+            continue
+        try:
+            entry = await asyncio.to_thread(_load, name, local_path)
+        except Exception as e:
+            # keep serving the loaded version; the file is retried on the next pass
+            print(f"Model registry could not reload {name} from {local_path}: {e}")
+            continue
+        _missing.pop(name, None)
+        _put(name, entry)
+        swapped.append(name)
+    if swapped:
+        print(f"Model registry swapped in {swapped}")
+    return swapped
+
+
+async def watch(interval=WATCH_INTERVAL):
+    """Background task: keep picking up retrained models."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload_changed()
+        except Exception as e:
+            print(f"Model registry reload failed: {e}")
+
+
+def loaded():
+    """{name: source path} of the models held, least recently used first."""
+    return {name: path for name, (_, path, _) in _models.items()}
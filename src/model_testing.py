@@ -1,22 +1,20 @@
+# run from the repo root: python -m src.model_testing
 import pandas as pd
 import numpy as np
 from xgboost import XGBRegressor
 import os
 from sklearn.metrics import root_mean_squared_error, mean_absolute_error
 from sklearn.multioutput import MultiOutputRegressor
+from src.data_loader import load_history_csv
 
 ##################################### LOAD DATA #####################################
 
-# Read the CSV
-df = pd.read_csv(r"utils\air_quality_historic_data_csv\historical_air_pollution_all_Rawalpindi.csv")
+# Read the CSV (typed and already sorted by time)
+df = load_history_csv(r"utils/air_quality_historic_data_csv/historical_air_pollution_all_Rawalpindi.csv")
 
 # PREPROCESSING time 
-# Convert 'Date' to datetime
-df['Date'] = pd.to_datetime(df['Timestamp'])
-# Set 'Date' as index
-df.set_index('Date', inplace=True)
-# sorting by date
-df = df.sort_values('Timestamp')
+# Set the parsed timestamps as index
+df.set_index(df['Timestamp'].rename('Date'), inplace=True)
 
 ######################################## PREPROCESSING data (Feature enginnering) ######################################
 # Create lag features
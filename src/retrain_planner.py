@@ -0,0 +1,69 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# decides which cities a retrain run trains and remembers how each city's last attempt went:
+#   /tmp/models/retrain_state.json  {city: {"status": "trained"|"failed"|"skipped", "trained_till", "error", "updated"}}
+# a city is trained when it has no model yet, its last attempt failed or it has MIN_NEW_ROWS
+# feature rows newer than its last trained timestamp, so a rerun after a partial failure
+# only redoes the cities that failed
+MODELS_DIR = os.path.join("/tmp", "models")
+STATE_PATH = os.path.join(MODELS_DIR, "retrain_state.json")
+MIN_NEW_ROWS = int(os.getenv("RETRAIN_MIN_NEW_ROWS", "24"))
+
+
+def last_trained_timestamp(city_name):
+    """The newest feature row the city's current model was trained on, or None."""
+    path = os.path.join(MODELS_DIR, f"{city_name}_last_trained_timestamp.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return pd.Timestamp(f.read().strip())
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def record(city_name, status, trained_till=None, error=None, path=STATE_PATH):
+    """Store the outcome of one city's retrain attempt (written atomically)."""
+    state = load_state(path)
+    state[city_name] = {
+        "status": status,
+        "trained_till": trained_till if trained_till is not None else state.get(city_name, {}).get("trained_till"),
+        "error": error,
+        "updated": datetime.now().isoformat(timespec="seconds"),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def new_rows(times, last_trained):
+    """Number of feature rows (sorted datetime64 times) after last_trained."""
+    if last_trained is None:
+        return len(times)
+    return len(times) - int(np.searchsorted(times, np.datetime64(last_trained.to_datetime64(), "s"), side="right"))
+
+
+def needs_training(city_name, times, min_new_rows=MIN_NEW_ROWS, force=False, state=None):
+    """
+    (train?, reason) for a city whose cached feature rows have the given times.
+    """
+    state = load_state() if state is None else state
+    if force:
+        return True, "forced"
+    if not os.path.exists(os.path.join(MODELS_DIR, f"xgboost_model_{city_name}.pkl")):
+        return True, "no model yet"
+    if state.get(city_name, {}).get("status") == "failed":
+        return True, "last attempt failed"
+    count = new_rows(times, last_trained_timestamp(city_name))
+    if count < min_new_rows:
+        return False, f"{count} new rows, fewer than {min_new_rows}"
+    return True, f"{count} new rows"
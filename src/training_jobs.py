@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from src import http_client
+from src.retrain_planner import load_state
+
+# retrain jobs run training() in a separate, lower priority worker process so the API event loop
+# keeps serving predictions; at most one job is active, a retrain request while one is queued
+# or running gets that job back instead of starting another
+JOBS_DIR = os.path.join("/tmp", "training_jobs")
+WORKER_NICENESS = int(os.getenv("TRAINING_WORKER_NICENESS", "10"))
+LOG_TAIL_LINES = 20
+JOB_POLL_SECONDS = 5
+
+# job id -> {"id", "status", "created", "started", "finished", "exitcode", "log", "options"}, for the life of the process
+_jobs = {}
+_processes = {}
+# the endpoints run in fastapi's threadpool: the check for an active job and the start of a new
+# one happen under this lock, so concurrent retrain requests get one job
+_lock = threading.RLock()
+_context = multiprocessing.get_context("spawn")
+
+
+def _run_job(log_path, options):
+    """
+    Worker process entry point: run one training with its output going to the job log. The worker
+    leads its own process group, so cancel() also reaches the training pool processes it starts.
+    """
+    if hasattr(os, "setsid"):  # process groups and niceness are posix only
+        os.setsid()
+        os.nice(WORKER_NICENESS)
+    log = open(log_path, "a", buffering=1)
+    sys.stdout = sys.stderr = log
+    # http_client was imported with this module, so its bucket is resized rather than configured
+    http_client.set_rate_share(http_client.TRAINING_RATE_SHARE)
+    import asyncio
+    from src.model import training
+    result = asyncio.run(training(**options))
+    if result == "training already running":
+        sys.exit(1)
+
+
+def _refresh(job_id):
+    """Fold the worker process's state into the job record."""
+    job = _jobs[job_id]
+    process = _processes.get(job_id)
+    if job["status"] == "running" and process is not None and not process.is_alive():
+        job["exitcode"] = process.exitcode
+        job["status"] = "succeeded" if process.exitcode == 0 else "failed"
+        job["finished"] = datetime.now().isoformat(timespec="seconds")
+        process.close()
+        del _processes[job_id]
+        http_client.set_rate_share(http_client.API_RATE_SHARE)
+    return job
+
+
+def _watch(job_id):
+    """
+    Daemon thread of a job: settle it soon after its worker exits, so the api gets its full quota
+    back even when nobody polls the job (the monthly workflow only posts /retrain).
+    """
+    while True:
+        time.sleep(JOB_POLL_SECONDS)
+        with _lock:
+            if _refresh(job_id)["status"] not in ("queued", "running"):
+                return
+
+
+def active_job():
+    """The queued or running job, if any."""
+    with _lock:
+        for job_id in list(_jobs):
+            if _refresh(job_id)["status"] in ("queued", "running"):
+                return _jobs[job_id]
+        return None
+
+
+def submit(**options):
+    """
+    Start a retrain job with the given training() options, or return the active one.
+    Returns (job, deduplicated).
+    """
+    with _lock:
+        job = active_job()
+        if job is not None:
+            return job, True
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "started": None,
+            "finished": None,
+            "exitcode": None,
+            "log": os.path.join(JOBS_DIR, f"{job_id}.log"),
+            "options": options,
+        }
+        _jobs[job_id] = job
+        process = _context.Process(target=_run_job, args=(job["log"], options), name=f"training-{job_id[:8]}")
+        http_client.set_rate_share(http_client.API_RATE_SHARE - http_client.TRAINING_RATE_SHARE)
+        process.start()
+        _processes[job_id] = process
+        job["status"] = "running"
+        job["started"] = datetime.now().isoformat(timespec="seconds")
+        threading.Thread(target=_watch, args=(job_id,), name=f"training-watch-{job_id[:8]}", daemon=True).start()
+        return job, False
+
+
+def status(job_id):
+    """The job record plus its progress (per-city outcomes recorded since it started and the log tail), or None."""
+    with _lock:
+        if job_id not in _jobs:
+            return None
+        job = dict(_refresh(job_id))
+        started = job["started"] or job["created"]
+        job["cities"] = {
+            city: entry["status"] for city, entry in load_state().items() if (entry.get("updated") or "") >= started
+        }
+        job["log_tail"] = []
+        if os.path.exists(job["log"]):
+            with open(job["log"], "r") as f:
+                job["log_tail"] = [line.rstrip("\n") for line in f.readlines()[-LOG_TAIL_LINES:]]
+        return job
+
+
+def _signal_group(process, kill=False):
+    """
+    SIGTERM (SIGKILL with kill) the worker and every process of its group; the worker alone if it has
+    not set up its group yet, or on Windows, which has no process groups.
+    """
+    if not hasattr(os, "killpg"):
+        process.kill() if kill else process.terminate()
+        return
+    signum = signal.SIGKILL if kill else signal.SIGTERM
+    try:
+        os.killpg(process.pid, signum)
+    except (ProcessLookupError, PermissionError):
+        os.kill(process.pid, signum)
+
+
+def cancel(job_id):
+    """Stop a running job's worker. Returns the job record, or None for an unknown id."""
+    with _lock:
+        if job_id not in _jobs:
+            return None
+        job = _refresh(job_id)
+        process = _processes.pop(job_id, None)
+        if job["status"] in ("queued", "running") and process is not None:
+            _signal_group(process)
+            process.join(timeout=10)
+            if process.is_alive():
+                _signal_group(process, kill=True)
+                process.join()
+            process.close()
+            job["status"] = "cancelled"
+            job["finished"] = datetime.now().isoformat(timespec="seconds")
+            http_client.set_rate_share(http_client.API_RATE_SHARE)
+        return job
+
+
+def shutdown():
+    """Cancel whatever is still running; called when the API stops."""
+    with _lock:
+        for job_id in list(_processes):
+            cancel(job_id)
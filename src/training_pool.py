@@ -0,0 +1,166 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.multioutput import MultiOutputRegressor
+from xgboost import XGBRegressor
+from src.feature_cache import open_feature_matrices
+
+# threads each training worker may use; workers = cpu budget // threads per worker
+THREADS_PER_WORKER = int(os.getenv("TRAIN_THREADS_PER_WORKER", "1"))
+CPU_BUDGET = int(os.getenv("TRAIN_CPU_BUDGET", str(os.cpu_count() or 1)))
+
+# "per_horizon": a MultiOutputRegressor of one XGBRegressor per horizon (default)
+# "multi_output": one XGBRegressor over all horizons, growing vector-leaf trees
+MODEL_TYPE = os.getenv("TRAIN_MODEL_TYPE", "per_horizon")
+MULTI_OUTPUT_PARAMS = {"tree_method": "hist", "multi_strategy": "multi_output_tree"}
+
+# boosting rounds a warm-started retrain adds to each previous booster
+INCREMENTAL_ROUNDS = int(os.getenv("TRAIN_INCREMENTAL_ROUNDS", "10"))
+
+
+def _limit_threads(threads):
+    """Pool initializer: keep every native thread pool in a worker inside its budget."""
+    for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]:
+        os.environ[var] = str(threads)
+
+
+def training_rows(city_name, feature_cols, lag_hours, forecast_horizon, since=None):
+    """The cached feature columns and targets of a city as (X DataFrame, Y), only rows at or after `since` if given."""
+    X, Y, times, all_cols, _ = open_feature_matrices(city_name, lag_hours, forecast_horizon)
+    rows = slice(None) if since is None else slice(int(np.searchsorted(times, np.datetime64(since.replace(" ", "T"), "s"))), None)
+    X_train = pd.DataFrame(X[rows, [all_cols.index(col) for col in feature_cols]], columns=feature_cols, copy=False)
+    return X_train, Y[rows]
+
+
+def boost_estimator(estimator, dtrain, previous=None):
+    """Train estimator's booster on dtrain; with a previous estimator, add INCREMENTAL_ROUNDS rounds to its booster."""
+    if previous is None:
+        booster = xgb.train(estimator.get_xgb_params(), dtrain, num_boost_round=estimator.n_estimators)
+    else:
+        booster = xgb.train(estimator.get_xgb_params(), dtrain, num_boost_round=INCREMENTAL_ROUNDS,
+                            xgb_model=previous.get_booster())
+    estimator.load_model(booster.save_raw("ubj"))
+    return estimator
+
+
+def fit_horizons(city_name, horizons, feature_cols, lag_hours, forecast_horizon, params, threads, warm=None):
+    """
+    Fit the XGBRegressors of some horizons of a city on its memory-mapped feature cache.
+    The features are quantized into one QuantileDMatrix shared by all the horizons, only the
+    label changes between boosters; the boosters are identical to XGBRegressor.fit's.
+    warm=(since, previous estimators of these horizons) continues those boosters on the rows from since on.
+    Runs inside a pool worker; returns (city, horizons, estimators, start, end).
+    """
+    start = time.time()
+    since, previous = warm or (None, [None] * len(horizons))
+    X_train, Y = training_rows(city_name, feature_cols, lag_hours, forecast_horizon, since)
+    dtrain = xgb.QuantileDMatrix(X_train, label=Y[:, horizons[0]], max_bin=params.get("max_bin"), nthread=threads)
+    estimators = []
+    for horizon, previous_estimator in zip(horizons, previous):
+        dtrain.set_label(Y[:, horizon])
+        estimators.append(boost_estimator(XGBRegressor(**{**params, "n_jobs": threads}), dtrain, previous_estimator))
+    return city_name, horizons, estimators, start, time.time()
+
+
+def horizon_groups(forecast_horizon, n_groups):
+    """Split the horizons into n_groups contiguous groups, each trained against one shared matrix."""
+    return [list(group) for group in np.array_split(range(forecast_horizon), n_groups) if len(group)]
+
+
+def fit_multi_output(city_name, feature_cols, lag_hours, forecast_horizon, params, threads, warm=None):
+    """
+    Fit one multi-target XGBRegressor over all AQI_t+h columns of a city.
+    warm=(since, previous model) continues the previous model on the rows from since on.
+    Runs inside a pool worker; returns (city, None, model, start, end).
+    """
+    start = time.time()
+    since, previous = warm or (None, None)
+    X_train, Y = training_rows(city_name, feature_cols, lag_hours, forecast_horizon, since)
+    model = XGBRegressor(**{**params, **MULTI_OUTPUT_PARAMS, "n_jobs": threads})
+    if previous is None:
+        model.fit(X_train, Y)
+    else:
+        boost_estimator(model, xgb.QuantileDMatrix(X_train, label=Y, max_bin=params.get("max_bin"), nthread=threads), previous)
+    return city_name, None, model, start, time.time()
+
+
+def assemble_model(estimators, feature_cols, params):
+    """A fitted MultiOutputRegressor from per-horizon estimators, identical to MultiOutputRegressor.fit's result."""
+    model = MultiOutputRegressor(XGBRegressor(**params))
+    model.estimators_ = estimators
+    model.n_features_in_ = len(feature_cols)
+    model.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+    return model
+
+
+################################################### pool training #######################################################
+def fit_city_models(cities, feature_cols, params, lag_hours=30, forecast_horizon=12,
+                    cpu_budget=CPU_BUDGET, threads_per_worker=THREADS_PER_WORKER, model_type=MODEL_TYPE,
+                    warm_starts=None):
+    """
+    Train the models of every city across a process pool of cpu_budget // threads_per_worker
+    workers, each limited to threads_per_worker threads. The feature caches of the cities must be built.
+    model_type "per_horizon" spreads (city, horizon group) fits and returns MultiOutputRegressors,
+    "multi_output" fits one multi-target XGBRegressor per city.
+    warm_starts {city: (since, previous model of model_type)} continues those cities' previous
+    models on their rows from since on instead of refitting them on the full history.
+    Returns ({city: model}, {city: wall seconds from its first to its last fit}, {failed city: error}).
+    """
+    warm_starts = warm_starts or {}
+    slots = max(1, cpu_budget // max(1, threads_per_worker))
+    # tasks are (leading fit arguments, warm start or None)
+    if model_type == "multi_output":
+        fit, tasks = fit_multi_output, [((city,), warm_starts.get(city)) for city in cities]
+    else:
+        # as few horizon groups per city as keep every worker busy: each group quantizes the features once
+        n_groups = min(forecast_horizon, -(-slots // max(1, len(cities))))
+        fit, tasks = fit_horizons, [
+            ((city, group), (warm_starts[city][0], [warm_starts[city][1].estimators_[h] for h in group]) if city in warm_starts else None)
+            for city in cities for group in horizon_groups(forecast_horizon, n_groups)
+        ]
+    workers = max(1, min(len(tasks), slots))
+    print(f"training {len(cities)} cities ({model_type}, {len(tasks)} fits) on {workers} workers x {threads_per_worker} threads")
+
+    results = []
+    failures = {}
+    if workers == 1:
+        # nothing to spread: fit in this process with the whole budget
+        for task, warm in tasks:
+            try:
+                results.append(fit(*task, feature_cols, lag_hours, forecast_horizon, params, cpu_budget, warm))
+            except Exception as e:
+                failures[task[0]] = str(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads, initargs=(threads_per_worker,)) as pool:
+            city_of = {
+                pool.submit(fit, *task, feature_cols, lag_hours, forecast_horizon, params, threads_per_worker, warm): task[0]
+                for task, warm in tasks
+            }
+            for future in as_completed(city_of):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failures[city_of[future]] = str(e)
+
+    # a city with any failed fit gets no model
+    cities = [city for city in cities if city not in failures]
+    estimators = {city: [None] * forecast_horizon for city in cities}
+    models = {}
+    spans = {city: [] for city in cities}
+    for city, horizons, fitted, start, end in results:
+        if city in failures:
+            continue
+        if horizons is None:
+            models[city] = fitted
+        else:
+            for horizon, estimator in zip(horizons, fitted):
+                estimators[city][horizon] = estimator
+        spans[city] += [start, end]
+    for city in cities:
+        if city not in models:
+            models[city] = assemble_model(estimators[city], feature_cols, params)
+    wall_times = {city: max(spans[city]) - min(spans[city]) for city in cities}
+    return models, wall_times, failures
@@ -1,6 +1,7 @@
 #to run file use command: streamlit run ui.py
 
 from src.air_polution_data_get import get_history_data, get_latest_data,get_cordinates
+from src import http_client
 import streamlit as st
 import plotly.express as px
 import datetime
@@ -8,6 +9,8 @@ import requests
 import pandas as pd
 import asyncio
 
+# streamlit runs next to the api (start.sh): keep to the ui's share of the openweather quota
+http_client.set_rate_share(http_client.UI_RATE_SHARE)
 
 
 st.set_page_config(